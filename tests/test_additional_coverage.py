@@ -5,7 +5,7 @@
 import os
 import sys
 from datetime import datetime
-from typing import cast, Any, List
+from typing import cast, Any, Dict, List
 
 import pytest
 
@@ -107,5 +107,40 @@ class TestMainFunction:
         assert any("Error parsing date" in output for output in captured_output)  # type: ignore
 
 
+class TestLogDebugSegment:
+    """Test the traced debug segment output."""
+
+    def test_log_debug_segment_only_for_target_workout(self, capsys: Any):  # type: ignore
+        """Should print only for the 400 m segment of the traced date."""
+        info = {"segment_dist": 401.0, "num_points": 10, "total_dist": 5000.0}
+
+        ahs._log_debug_segment(True, datetime(2021, 12, 26, 9), 400.0, 90.0, info)  # type: ignore
+        ahs._log_debug_segment(True, datetime(2021, 12, 27, 9), 400.0, 90.0, info)  # type: ignore
+        ahs._log_debug_segment(False, datetime(2021, 12, 26, 9), 400.0, 90.0, info)  # type: ignore
+
+        lines = capsys.readouterr().out.splitlines()  # type: ignore
+        assert lines == [
+            "DEBUG [26/12/2021, 400m]: duration=90.00s, "
+            "dist_covered=401.0m, pts=10, total=5000m"
+        ]
+
+    def test_debug_info_only_for_traced_workout(self, monkeypatch: Any):  # type: ignore
+        """--debug alone should collect segment details only for the traced date."""
+        calls: List[Any] = []
+
+        def fake_best_segments(points, targets, max_speed, penalty, debug_infos):  # type: ignore
+            calls.append(debug_infos)
+            return [(float("inf"), None, None, 0.0, 0.0) for _ in targets]
+
+        monkeypatch.setattr(ahs, "best_segments_for_dists", fake_best_segments)
+        best: Dict[float, List[Any]] = {400.0: []}
+        for day in (26, 27):
+            ahs._process_distances(  # type: ignore
+                [400.0], None, datetime(2021, 12, day, 9), best, {}, {"debug": True}
+            )
+
+        assert calls == [[{}], None]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -47,6 +47,15 @@ class TestCLIArgumentParsing:
         assert args.progress is False
         assert args.start_date == "20240101"
 
+    def test_add_filter_args_cache(self):
+        """Cache should be off by default and enabled with --cache."""
+        parser = argparse.ArgumentParser()
+        ahs._add_filter_args(parser)  # type: ignore
+        assert parser.parse_args([]).cache is False
+        args = parser.parse_args(["--cache", "--cache-dir", "cache"])
+        assert args.cache is True
+        assert args.cache_dir == "cache"
+
 
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
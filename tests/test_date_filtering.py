@@ -3,6 +3,7 @@
 """Tests for date filtering functions."""
 
 import argparse
+import itertools
 import os
 import sys
 from datetime import datetime, date
@@ -108,6 +109,26 @@ class TestHelperFunctions:
         result = ahs._should_skip_workout(workout_date, start_date, end_date)  # type: ignore
         assert result is False
 
+    def test_select_workouts_applies_date_filters(self):
+        """Should keep only workouts inside the range, with resolved dates."""
+        workout_to_files = {
+            "wk_0": ["a.gpx"],
+            "wk_1": ["b.gpx"],
+            "wk_2": ["c.gpx"],
+        }
+        running_workouts = {
+            "wk_0": {"start": datetime(2023, 12, 31), "end": None},
+            "wk_1": {"start": datetime(2024, 3, 1), "end": None},
+            "wk_2": {"start": None, "end": None},
+        }
+        result = ahs._select_workouts(  # type: ignore
+            workout_to_files, running_workouts, date(2024, 1, 1), date(2024, 12, 31)
+        )
+        assert result == [
+            ("wk_1", ["b.gpx"], datetime(2024, 3, 1)),
+            ("wk_2", ["c.gpx"], None),
+        ]
+
     def test_finalize_results_sorting(self):
         """Should sort and trim results correctly."""
         best_segments = {
@@ -118,6 +139,18 @@ class TestHelperFunctions:
         assert abs(result[1000.0][0][0] - 100.0) < 1e-9  # type: ignore
         assert abs(result[1000.0][1][0] - 105.0) < 1e-9  # type: ignore
 
+    def test_keep_fastest_matches_stable_sort(self):
+        """Bounded heaps should keep the same segments as sorting them all."""
+        segments = [(120.0, 1), (100.0, 2), (110.0, 3), (100.0, 4), (105.0, 5)]
+        heaps = {1000.0: []}  # type: ignore
+        arrivals = itertools.count()
+        for seg in segments:
+            ahs._keep_fastest(heaps, {1000.0: [seg]}, 3, arrivals)  # type: ignore
+
+        kept = [seg for _, _, seg in sorted(heaps[1000.0], reverse=True)]
+        assert len(heaps[1000.0]) == 3
+        assert kept == sorted(segments, key=lambda x: x[0])[:3]
+
     def test_finalize_results_empty(self):
         """Should handle empty segments."""
         best_segments = {1000.0: []}  # type: ignore
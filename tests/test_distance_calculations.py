@@ -53,5 +53,41 @@ class TestHaversineMeters:
         assert abs(d1 - d2) < 1e-6, "Haversine distance should be symmetric"  # type: ignore
 
 
+class TestConsecutiveDistances:
+    """Unit tests for the vectorized route leg distances."""
+
+    def test_consecutive_distances_match_haversine(self):
+        """Route leg distances should match pairwise haversine distances."""
+        lats = [49.6116, 49.6120, 49.6131, 49.6131]
+        lons = [6.1319, 6.1325, 6.1330, 6.1340]
+
+        result = sa._consecutive_distances(sa.np.array(lats), sa.np.array(lons))
+
+        assert len(result) == 3  # type: ignore
+        for k, value in enumerate(result):  # type: ignore
+            expected = sa.haversine_meters(lats[k], lons[k], lats[k + 1], lons[k + 1])
+            assert abs(value - expected) < 1e-6  # type: ignore
+
+    def test_consecutive_distances_across_antimeridian(self):
+        """A leg crossing 180 degrees longitude should take the short way."""
+        result = sa._consecutive_distances(
+            sa.np.array([0.0, 0.0]), sa.np.array([179.9999, -179.9999])
+        )
+
+        expected = sa.haversine_meters(0.0, 179.9999, 0.0, -179.9999)
+        assert abs(result[0] - expected) < 1e-6  # type: ignore
+
+    def test_consecutive_distances_long_legs_at_high_latitude(self):
+        """Kilometre legs far from the equator should still match haversine."""
+        lats = [69.6492, 69.6582, 69.6582]
+        lons = [18.9553, 18.9553, 19.0340]
+
+        result = sa._consecutive_distances(sa.np.array(lats), sa.np.array(lons))
+
+        for k, value in enumerate(result):  # type: ignore
+            expected = sa.haversine_meters(lats[k], lons[k], lats[k + 1], lons[k + 1])
+            assert abs(value - expected) < 1e-6  # type: ignore
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
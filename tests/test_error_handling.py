@@ -10,6 +10,7 @@ import zipfile
 from datetime import datetime
 from io import BytesIO
 from typing import Any
+from unittest.mock import patch
 
 import pytest
 
@@ -149,6 +150,104 @@ class TestErrorHandling:
         finally:
             os.unlink(f.name)
 
+    def test_collect_workouts_and_routes_share_one_scan(self):
+        """Collecting workouts then routes should parse export.xml once."""
+        with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as f:
+            with zipfile.ZipFile(f.name, "w") as z:
+                z.writestr(
+                    "export.xml", "<?xml version='1.0'?><HealthData></HealthData>"
+                )
+
+        try:
+            with ExportReader(f.name) as reader:
+                with patch.object(
+                    reader, "scan_export", wraps=reader.scan_export
+                ) as scan_export:
+                    reader.collect_running_workouts("export.xml")
+                    reader.collect_routes("export.xml")
+                assert scan_export.call_count == 1
+        finally:
+            os.unlink(f.name)
+
+    def test_scan_export_keeps_nested_route_references(self):
+        """Routes nested in a Workout should keep their FileReference paths."""
+        with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as f:
+            xml_content = """<?xml version="1.0"?>
+            <HealthData>
+                <Record type="HKQuantityTypeIdentifierStepCount"/>
+                <Workout workoutActivityType="HKWorkoutActivityTypeRunning"
+                         startDate="2024-01-01 10:00:00 +0000"
+                         endDate="2024-01-01 10:30:00 +0000">
+                    <WorkoutRoute startDate="2024-01-01 10:00:00 +0000"
+                                  endDate="2024-01-01 10:30:00 +0000">
+                        <FileReference path="/workout-routes/route_1.gpx"/>
+                    </WorkoutRoute>
+                </Workout>
+                <Workout workoutActivityType="HKWorkoutActivityTypeCycling"/>
+            </HealthData>"""
+            with zipfile.ZipFile(f.name, "w") as z:
+                z.writestr("export.xml", xml_content)
+
+        try:
+            with ExportReader(f.name) as reader:
+                workouts, routes = reader.scan_export("export.xml")
+                assert list(workouts) == ["wk_0"]
+                assert len(routes) == 1
+                assert routes[0][2] == ["/workout-routes/route_1.gpx"]
+        finally:
+            os.unlink(f.name)
+
+    def test_collect_routes_fallback_parses_bytes(self):
+        """Text fallback should extract route times and paths from raw bytes."""
+        with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as f:
+            xml_content = """<?xml version="1.0"?>
+            <HealthData>
+                <WorkoutRoute creationDate="2024-01-01 10:30:00 +0000"
+                              startDate="2024-01-01 10:00:00 +0000"
+                              endDate="2024-01-01 10:20:00 +0000">
+                    <FileReference path="/workout-routes/route_1.gpx"/>
+                </WorkoutRoute>
+                <WorkoutRoute startDate="2024-01-02 10:00:00 +0000">
+                </WorkoutRoute>
+            </HealthData>"""
+            with zipfile.ZipFile(f.name, "w") as z:
+                z.writestr("export.xml", xml_content)
+
+        try:
+            with ExportReader(f.name) as reader:
+                routes = reader.collect_routes_fallback("export.xml")
+                assert len(routes) == 1
+                start_dt, end_dt, paths = routes[0]
+                assert start_dt == parse_timestamp("2024-01-01 10:00:00 +0000")
+                assert end_dt == parse_timestamp("2024-01-01 10:20:00 +0000")
+                assert paths == ["/workout-routes/route_1.gpx"]
+        finally:
+            os.unlink(f.name)
+
+    def test_collect_routes_fallback_across_chunks(self, monkeypatch):
+        """Routes split across read chunks should all be found."""
+        route = (
+            '<WorkoutRoute startDate="2024-01-0{0} 10:00:00 +0000" '
+            'endDate="2024-01-0{0} 10:20:00 +0000">'
+            '<FileReference path="/workout-routes/route_{0}.gpx"/></WorkoutRoute>'
+        )
+        xml_content = "<HealthData>" + "".join(
+            route.format(i) for i in range(1, 6)
+        ) + "</HealthData>"
+        with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as f:
+            with zipfile.ZipFile(f.name, "w") as z:
+                z.writestr("export.xml", xml_content)
+
+        monkeypatch.setattr(export_processor, "_FALLBACK_CHUNK_SIZE", 7)
+        try:
+            with ExportReader(f.name) as reader:
+                routes = reader.collect_routes_fallback("export.xml")
+            assert [paths for _, _, paths in routes] == [
+                [f"/workout-routes/route_{i}.gpx"] for i in range(1, 6)
+            ]
+        finally:
+            os.unlink(f.name)
+
     def test_resolve_zip_path_empty_string(self):
         """Empty path should return None."""
         with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as f:
@@ -175,6 +274,26 @@ class TestErrorHandling:
         finally:
             os.unlink(f.name)
 
+    def test_resolve_zip_path_and_open_entry(self):
+        """FileReference paths should resolve under apple_health_export/."""
+        with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as f:
+            with zipfile.ZipFile(f.name, "w") as z:
+                z.writestr("apple_health_export/workout-routes/r.gpx", "content")
+
+        try:
+            with ExportReader(f.name) as reader:
+                result = reader.resolve_zip_path("/workout-routes/r.gpx")
+                assert result == "apple_health_export/workout-routes/r.gpx"
+                with reader.open_entry(result) as fh:
+                    assert fh.read() == b"content"
+                assert reader.read_entry(result) == b"content"
+                assert reader.entry_size(result) == len(b"content")
+                assert reader.resolve_zip_path("/workout-routes/r.gpx") == result
+                assert reader.resolve_zip_path("missing.gpx") is None
+                assert reader.resolve_zip_path("missing.gpx") is None
+        finally:
+            os.unlink(f.name)
+
 
 class TestEdgeCases:
     """Test edge cases and boundary conditions."""
@@ -198,6 +317,58 @@ class TestEdgeCases:
         points = list(stream_points_from_route(bio))
         assert not points
 
+    def test_stream_points_line_format(self):
+        """Non-XML route data should be parsed line by line."""
+        bio = BytesIO(
+            b"header line\n"
+            b'latitude="48.85" longitude="2.35" altitude="35.0" '
+            b'timestamp="2024-01-01T10:00:00Z"\n'
+            b"latitude=48.86 longitude=2.36 timestamp=2024-01-01T10:00:05Z\n"
+        )
+        points = list(stream_points_from_route(bio))
+        assert len(points) == 2
+        assert points[0][:3] == (48.85, 2.35, 35.0)
+        assert points[1][:3] == (48.86, 2.36, 0.0)
+
+    def test_stream_points_line_format_quoted_timestamp(self):
+        """Quoted timestamps containing spaces should be kept whole."""
+        bio = BytesIO(
+            b'point latitude="48.85" longitude="2.35" '
+            b'timestamp="2024-01-01 10:00:07 +0000"\n'
+        )
+        points = list(stream_points_from_route(bio))
+        assert len(points) == 1
+        assert points[0][3].second == 7
+
+    def test_stream_points_across_sniff_boundary(self):
+        """Lines straddling the format sniff window should parse intact."""
+        line = b"latitude=48.86 longitude=2.36 timestamp=2024-01-01T10:00:05Z\n"
+        bio = BytesIO(line * 200)
+        points = list(stream_points_from_route(bio))
+        assert len(points) == 200
+        assert all(p[:2] == (48.86, 2.36) for p in points)
+
+    def test_stream_points_lxml_matches_stdlib(self, monkeypatch):
+        """The lxml parser should yield the same points as the stdlib one."""
+        pytest.importorskip("lxml")
+        xml_data = b"""<?xml version="1.0"?>
+        <gpx xmlns="http://www.topografix.com/GPX/1/1">
+            <trk><trkseg>
+                <trkpt lat="48.1" lon="2.1"><ele>35.0</ele>
+                    <time>2024-01-01T10:00:00Z</time></trkpt>
+                <!-- comment -->
+                <trkpt lat="48.2" lon="2.2"><time>2024-01-01T10:00:05Z</time></trkpt>
+                <trkpt lat="48.3" lon="2.3"/>
+            </trkseg></trk>
+            <Location latitude="48.4" longitude="2.4" altitude="12"
+                      timestamp="2024-01-01 10:00:10 +0000"/>
+        </gpx>"""
+        with_lxml = list(stream_points_from_route(BytesIO(xml_data)))
+        monkeypatch.setattr(export_processor, "lxml_etree", None)
+        without_lxml = list(stream_points_from_route(BytesIO(xml_data)))
+        assert len(with_lxml) == 3
+        assert with_lxml == without_lxml
+
     def test_workout_times_missing_attributes(self):
         """Test workout parsing with missing time attributes."""
         with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as f:
@@ -4,6 +4,8 @@
 
 import os
 import sys
+from datetime import datetime, timedelta
+from io import BytesIO
 from typing import cast, Any
 
 import pytest
@@ -54,6 +56,31 @@ class TestExportProcessorEdgeCases:
         assert abs(lon - 0.0) < 1e-6  # type: ignore
         assert abs(ele - 0.0) < 1e-6  # Should default to 0.0  # type: ignore
 
+    def test_parse_xml_location_schema_change(self):
+        """Locations deviating from the first element's attribute names still parse."""
+        data = (
+            b"<Route>"
+            b'<Location latitude="1.0" longitude="2.0" altitude="3.0" '
+            b'timestamp="2024-01-15 10:00:00 +0000"/>'
+            b'<Location lat="4.0" lon="5.0" time="2024-01-15T10:00:05Z"/>'
+            b"</Route>"
+        )
+        points = list(ep._parse_xml_data(BytesIO(data)))  # type: ignore
+        assert [p[:3] for p in points] == [(1.0, 2.0, 3.0), (4.0, 5.0, 0.0)]  # type: ignore
+
+    def test_parse_xml_location_elevation_after_missing_first(self):
+        """Elevation should be read even when the first Location has none."""
+        data = (
+            b"<Route>"
+            b'<Location latitude="1.0" longitude="2.0" '
+            b'timestamp="2024-01-15 10:00:00 +0000"/>'
+            b'<Location latitude="4.0" longitude="5.0" altitude="55" '
+            b'timestamp="2024-01-15 10:00:05 +0000"/>'
+            b"</Route>"
+        )
+        points = list(ep._parse_xml_data(BytesIO(data)))  # type: ignore
+        assert [p[:3] for p in points] == [(1.0, 2.0, 0.0), (4.0, 5.0, 55.0)]  # type: ignore
+
     def test_decode_line_with_bytes(self):
         """Should decode bytes to string."""
         result = ep._decode_line(b"test line")  # type: ignore
@@ -72,5 +99,39 @@ class TestExportProcessorEdgeCases:
         assert result is None  # type: ignore
 
 
+class TestMatchRoutesToWorkouts:
+    """Test route to workout matching."""
+
+    def test_matches_all_overlapping_workouts(self):
+        """Routes should attach to every workout they overlap, inclusively."""
+        base = datetime(2024, 1, 1, 10, 0, 0)
+
+        def at(minutes: int) -> datetime:
+            return base + timedelta(minutes=minutes)
+
+        workouts = {
+            "wk_0": {"start": at(0), "end": at(120)},
+            "wk_1": {"start": at(10), "end": at(20)},
+            "wk_2": {"start": at(30), "end": at(40)},
+            "wk_3": {"start": None, "end": at(40)},
+        }
+        routes = [
+            (at(15), at(30), ["a.gpx"]),
+            (at(121), at(130), ["b.gpx"]),
+            (at(40), at(50), ["c.gpx"]),
+            (None, at(50), ["d.gpx"]),
+            (at(12), at(14), ["a.gpx"]),
+        ]
+
+        result = ep.match_routes_to_workouts(routes, workouts)
+
+        assert result == {
+            "wk_0": ["a.gpx", "c.gpx"],
+            "wk_1": ["a.gpx"],
+            "wk_2": ["a.gpx", "c.gpx"],
+        }
+        assert list(result) == ["wk_0", "wk_1", "wk_2"]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
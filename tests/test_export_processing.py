@@ -8,6 +8,7 @@ import zipfile
 from datetime import datetime
 from io import BytesIO
 from typing import cast, Any
+from unittest.mock import patch
 
 import pytest
 
@@ -127,6 +128,120 @@ class TestIntegrationWithMockExport:
 
         assert isinstance(penalties, dict)
 
+    def test_process_export_parallel_matches_sequential(
+        self, mock_gpx_content, tmp_path
+    ):  # type: ignore
+        """Worker processes should produce the same results as one process."""
+        zip_path = str(tmp_path / "export.zip")  # type: ignore
+        workout = """  <Workout workoutActivityType="HKWorkoutActivityTypeRunning"
+           startDate="2024-01-15 10:00:00 +0000"
+           endDate="2024-01-15 10:01:00 +0000"/>
+"""
+        export_xml = f"""<?xml version="1.0" encoding="UTF-8"?>
+<HealthData>
+{workout}{workout}  <WorkoutRoute startDate="2024-01-15 10:00:00 +0000"
+                endDate="2024-01-15 10:01:00 +0000">
+    <FileReference path="/workout-routes/test_route.gpx"/>
+  </WorkoutRoute>
+</HealthData>"""
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            zf.writestr("export.xml", export_xml)
+            zf.writestr(
+                "apple_health_export/workout-routes/test_route.gpx",
+                mock_gpx_content,  # type: ignore
+            )
+
+        sequential = ahs.process_export(  # type: ignore
+            zip_path, distances_m=[100.0], config={"progress": False}
+        )
+        parallel = ahs.process_export(  # type: ignore
+            zip_path, distances_m=[100.0], config={"progress": False, "workers": 2}
+        )
+
+        assert len(sequential[0][100.0]) == 2  # type: ignore
+        assert parallel == sequential
+
+    def test_worker_chunksize(self):  # type: ignore
+        """Workouts should be batched about four per worker, at least one each."""
+        assert ahs._worker_chunksize(1, 4) == 1  # type: ignore
+        assert ahs._worker_chunksize(160, 4) == 10  # type: ignore
+        assert ahs._worker_chunksize(161, 4) == 11  # type: ignore
+
+    def test_load_workout_points_orders_route_files(self, tmp_path):  # type: ignore
+        """Points from several route files should come back in time order."""
+        zip_path = str(tmp_path / "export.zip")  # type: ignore
+        gpx = (
+            '<gpx><trk><trkseg><trkpt lat="{0}" lon="0.0">'
+            "<time>2024-01-15T10:00:{0}0Z</time></trkpt></trkseg></trk></gpx>"
+        )
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            zf.writestr("a.gpx", gpx.format(3))
+            zf.writestr("b.gpx", gpx.format(1))
+            zf.writestr("broken.gpx", "<gpx><trkpt")
+
+        with ahs.ExportReader(zip_path) as reader:  # type: ignore
+            points = ahs._load_workout_points(  # type: ignore
+                reader, {"a.gpx", "b.gpx", "broken.gpx", "missing.gpx"}
+            )
+
+        assert list(points.lat) == [1.0, 3.0]  # type: ignore
+        assert list(points.ts) == sorted(points.ts)  # type: ignore
+
+    def test_load_route_file_memoizes_decoded_routes(self, tmp_path):  # type: ignore
+        """A route referenced twice should be parsed only once per reader."""
+        zip_path = str(tmp_path / "export.zip")  # type: ignore
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            zf.writestr(
+                "a.gpx",
+                '<gpx><trk><trkseg><trkpt lat="1.0" lon="0.0">'
+                "<time>2024-01-15T10:00:00Z</time></trkpt></trkseg></trk></gpx>",
+            )
+
+        with ahs.ExportReader(zip_path) as reader:  # type: ignore
+            first = ahs._load_route_file(reader, "a.gpx")  # type: ignore
+            with patch.object(reader, "read_entry") as read_entry:
+                second = ahs._load_route_file(reader, "a.gpx")  # type: ignore
+            assert not read_entry.called
+            assert second is first
+            assert not first.lat.flags.writeable  # type: ignore
+        assert not reader.route_memo  # type: ignore
+
+    def test_load_route_file_streams_large_routes(
+        self, tmp_path, monkeypatch
+    ):  # type: ignore
+        """Routes above the buffering limit should be parsed from the archive."""
+        zip_path = str(tmp_path / "export.zip")  # type: ignore
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            zf.writestr(
+                "a.gpx",
+                '<gpx><trk><trkseg><trkpt lat="1.0" lon="0.0">'
+                "<time>2024-01-15T10:00:00Z</time></trkpt></trkseg></trk></gpx>",
+            )
+
+        monkeypatch.setattr(ahs, "_BUFFERED_ROUTE_MAX", 0)
+        with ahs.ExportReader(zip_path) as reader:  # type: ignore
+            with patch.object(reader, "read_entry") as read_entry:
+                points = ahs._load_route_file(reader, "a.gpx")  # type: ignore
+            assert not read_entry.called
+        assert list(points.lat) == [1.0]  # type: ignore
+
+    def test_process_export_cache_round_trip(
+        self, mock_export_zip, tmp_path
+    ):  # type: ignore
+        """A cached second run should give the same results as the first."""
+        config = {"progress": False, "cache": True, "cache_dir": str(tmp_path)}
+        first = ahs.process_export(  # type: ignore
+            mock_export_zip, distances_m=[100.0], config=config
+        )
+        cache = ahs.RouteCache(mock_export_zip, str(tmp_path))  # type: ignore
+        assert cache.load_index() is not None
+        second = ahs.process_export(  # type: ignore
+            mock_export_zip, distances_m=[100.0], config=config
+        )
+
+        assert len(first[0][100.0]) == 1  # type: ignore
+        assert second == first
+
     def test_process_export_returns_tuple(self, mock_export_zip):  # type: ignore
         """process_export should return (results, penalties) tuple."""
         result = ahs.process_export(  # type: ignore
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# pylint: disable=import-error,wrong-import-position,protected-access
+"""Tests for the points_on_date GPX extraction helper."""
+
+import os
+import sys
+import zipfile
+from datetime import datetime, timedelta, timezone
+from typing import Any, cast
+
+import pytest
+
+# Add tools directory to path
+tools_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "tools"))
+if tools_path not in sys.path:
+    sys.path.insert(0, tools_path)
+
+import points_on_date as pod  # noqa: E402 # type: ignore
+
+pod = cast(Any, pod)
+
+GPX_NS = b"""<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">
+  <trk><trkseg>
+    <trkpt lat="49.0" lon="6.0"><ele>250.0</ele><time>2024-01-15T10:00:00Z</time></trkpt>
+    <trkpt lat="49.001" lon="6.0"><ele>251.0</ele><time>2024-01-15T10:00:10Z</time></trkpt>
+    <trkpt lat="49.002" lon="6.0"><ele>252.0</ele></trkpt>
+  </trkseg></trk>
+</gpx>"""
+
+
+class TestParseGpxPoints:
+    """Tests for GPX trackpoint parsing."""
+
+    def test_parse_namespaced_gpx(self):
+        """Should yield one point per trkpt that has a time child."""
+        points = list(pod.parse_gpx_points(GPX_NS))  # type: ignore
+
+        assert len(points) == 2  # type: ignore
+        ts, lat, lon = points[0]  # type: ignore
+        assert (lat, lon) == (49.0, 6.0)
+        assert ts.isoformat() == "2024-01-15T10:00:00+00:00"
+
+    def test_parse_gpx_without_namespace(self):
+        """Should also handle GPX files without a default namespace."""
+        data = GPX_NS.replace(b' xmlns="http://www.topografix.com/GPX/1/1"', b"")
+
+        points = list(pod.parse_gpx_points(data))  # type: ignore
+
+        assert [p[1] for p in points] == [49.0, 49.001]  # type: ignore
+
+    def test_only_direct_time_child_is_used(self):
+        """A time nested deeper in the trkpt should not be taken as its time."""
+        data = (
+            b'<gpx><trkpt lat="1.0" lon="2.0"><extensions>'
+            b"<time>2020-01-01T00:00:00Z</time></extensions>"
+            b"<time>2024-01-15T10:00:00Z</time><time>2024-01-16T10:00:00Z</time>"
+            b'</trkpt><trkpt lat="3.0" lon="4.0"><extensions>'
+            b"<time>2020-01-01T00:00:00Z</time></extensions></trkpt></gpx>"
+        )
+
+        points = list(pod.parse_gpx_points(data))  # type: ignore
+
+        assert len(points) == 1  # type: ignore
+        assert points[0][0].isoformat() == "2024-01-15T10:00:00+00:00"
+
+    def test_malformed_gpx_raises_after_earlier_points(self):
+        """Points before a syntax error are yielded, then ParseError is raised."""
+        data = b'<gpx><trkpt lat="1.0" lon="2.0"><time>2024-01-15T10:00:00Z</time>'
+        data += b'</trkpt><trkpt lat="3.0"'
+        points = []
+
+        with pytest.raises(pod.ET.ParseError):  # type: ignore
+            for point in pod.parse_gpx_points(data):  # type: ignore
+                points.append(point)  # type: ignore
+
+        assert [p[1] for p in points] == [1.0]  # type: ignore
+
+
+class TestFindGpxFilesForDate:
+    """Tests for selecting the GPX files that mention a date."""
+
+    def test_match_across_chunk_boundary(self, tmp_path, monkeypatch):  # type: ignore
+        """A date split between two scanned chunks should still be found."""
+        zip_path = str(tmp_path / "export.zip")  # type: ignore
+        gpx = b"<gpx><trkpt><time>2024-01-15T10:00:00Z</time></trkpt></gpx>"
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            zf.writestr("routes/a.gpx", gpx)
+            zf.writestr("routes/b.gpx", gpx.replace(b"2024-01-15", b"2024-02-20"))
+            zf.writestr("export.xml", b"2024-01-15")
+
+        monkeypatch.setattr(pod, "_SCAN_CHUNK_SIZE", gpx.index(b"2024") + 4)
+        found = pod.find_gpx_files_for_date(zip_path, "2024-01-15")  # type: ignore
+
+        assert found == [("routes/a.gpx", gpx)]
+
+    def test_empty_date_matches_every_gpx(self, tmp_path):  # type: ignore
+        """An empty date string should select all GPX files, even empty ones."""
+        zip_path = str(tmp_path / "export.zip")  # type: ignore
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            zf.writestr("routes/a.gpx", GPX_NS)
+            zf.writestr("routes/empty.gpx", b"")
+
+        found = pod.find_gpx_files_for_date(zip_path, "")  # type: ignore
+
+        assert found == [("routes/a.gpx", GPX_NS), ("routes/empty.gpx", b"")]
+
+
+class TestFormatPointLines:
+    """Tests for the per-point duration, distance and speed columns."""
+
+    def test_columns_match_scalar_haversine(self):
+        """Array distances should match haversine_m for each consecutive pair."""
+        base = datetime(2024, 1, 15, 10, 0, 0, tzinfo=timezone.utc)
+        points = [
+            (base, 49.0, 6.0, "a.gpx"),
+            (base + timedelta(seconds=10), 49.001, 6.0, "a.gpx"),
+            (base + timedelta(seconds=10), 49.002, 6.001, "b.gpx"),
+            (base + timedelta(seconds=15), 49.003, 6.001, "b.gpx"),
+        ]
+
+        lines = pod.format_point_lines(points)  # type: ignore
+
+        assert lines[0] == (base.isoformat(), "0.00", "0.00", "0.00", "a.gpx")
+        dist = pod.haversine_m(49.0, 6.0, 49.001, 6.0)  # type: ignore
+        assert lines[1][1:4] == ("10.00", f"{dist:.2f}", f"{dist / 10 * 3.6:.2f}")
+        # No elapsed time: distance is reported but speed stays zero
+        assert lines[2][1] == "0.00" and lines[2][3] == "0.00"
+        assert float(lines[2][2]) > 0
+        assert [line[4] for line in lines] == ["a.gpx", "a.gpx", "b.gpx", "b.gpx"]
+
+    def test_empty_points(self):
+        """No points should give no lines."""
+        assert pod.format_point_lines([]) == []  # type: ignore
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# pylint: disable=import-error,wrong-import-position,protected-access
+"""Tests for the on-disk route cache."""
+
+import os
+import sys
+import zipfile
+from datetime import datetime, timedelta, timezone
+from typing import cast, Any
+
+import numpy as np
+import pytest
+
+# Add tools directory to path
+tools_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "tools"))
+if tools_path not in sys.path:
+    sys.path.insert(0, tools_path)
+
+import route_cache as rc  # noqa: E402 # type: ignore
+from segment_analysis import PointArrays  # noqa: E402 # type: ignore
+
+rc = cast(Any, rc)
+
+
+@pytest.fixture
+def zip_path(tmp_path):  # type: ignore
+    """Create an empty archive to key the cache on."""
+    path = str(tmp_path / "export.zip")  # type: ignore
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("export.xml", "<HealthData/>")
+    return path
+
+
+class TestRouteCache:
+    """Unit tests for RouteCache."""
+
+    def test_index_round_trip(self, zip_path, tmp_path):  # type: ignore
+        """Workouts and routes should load back with their time zones."""
+        cache = rc.RouteCache(zip_path, str(tmp_path / "cache"))  # type: ignore
+        start = datetime(2024, 1, 1, 10, 0, tzinfo=timezone(timedelta(hours=1)))
+        end = start + timedelta(minutes=30)
+        workouts = {
+            "wk_0": {"start": start, "end": end},
+            "wk_1": {"start": None, "end": None},
+        }
+        routes = [(start, end, ["/workout-routes/a.gpx"])]
+
+        assert cache.load_index() is None
+        cache.store_index(workouts, routes)
+        loaded_workouts, loaded_routes = cache.load_index()
+
+        assert loaded_workouts == workouts
+        assert loaded_routes == routes
+        assert loaded_workouts["wk_0"]["start"].utcoffset() == timedelta(hours=1)
+
+    def test_points_round_trip(self, zip_path, tmp_path):  # type: ignore
+        """Route points, including empty routes, should load back unchanged."""
+        cache = rc.RouteCache(zip_path, str(tmp_path / "cache"))  # type: ignore
+        points = PointArrays(
+            np.array([1.0, 2.0]),
+            np.array([3.0, 4.0]),
+            np.array([5.0, 6.0]),
+            np.array([7.0, 8.0]),
+        )
+        empty = PointArrays(*(np.empty(0) for _ in range(4)))
+
+        assert cache.load_points("a.gpx") is None
+        cache.store_points("a.gpx", points)
+        cache.store_points("b.gpx", empty)
+
+        loaded = cache.load_points("a.gpx")
+        for column, expected in zip(loaded, points):
+            assert list(column) == list(expected)
+        assert len(cache.load_points("b.gpx").ts) == 0
+
+    def test_modified_zip_uses_new_directory(self, zip_path, tmp_path):  # type: ignore
+        """Changing the archive should invalidate the cache."""
+        root = str(tmp_path / "cache")  # type: ignore
+        before = rc.RouteCache(zip_path, root).directory  # type: ignore
+        with zipfile.ZipFile(zip_path, "a") as zf:
+            zf.writestr("extra.txt", "more data")
+        after = rc.RouteCache(zip_path, root).directory  # type: ignore
+        assert before != after
+
+    def test_unwritable_cache_is_ignored(self, zip_path, tmp_path):  # type: ignore
+        """A cache root that cannot be created should not raise."""
+        blocker = tmp_path / "file"  # type: ignore
+        blocker.write_text("not a directory")  # type: ignore
+        cache = rc.RouteCache(zip_path, str(blocker))  # type: ignore
+        cache.store_index({}, [])
+        assert cache.load_index() is None
+
+    def test_failed_write_leaves_no_temp_file(self, zip_path, tmp_path):  # type: ignore
+        """A writer raising a non-OS error should be swallowed and cleaned up."""
+        cache = rc.RouteCache(zip_path, str(tmp_path))  # type: ignore
+
+        def fail(_fh):  # type: ignore
+            raise ValueError("cannot serialise")
+
+        cache._write_atomic("index.json", fail)  # type: ignore
+
+        assert os.listdir(cache.directory) == []  # type: ignore
+        assert cache.load_index() is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -14,9 +14,9 @@ tools_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "tool
 if tools_path not in sys.path:
     sys.path.insert(0, tools_path)
 
-import apple_health_segments as ahs  # type: ignore # noqa: E402
+import segment_analysis as sa  # type: ignore # noqa: E402
 
-ahs = cast(Any, ahs)
+sa = cast(Any, sa)
 
 
 class TestBestSegmentForDist:
@@ -35,7 +35,7 @@ class TestBestSegmentForDist:
 
     def test_segment_with_enough_points(self, simple_points):  # type: ignore
         """Should find a segment for reasonable distances."""
-        result = ahs.best_segment_for_dist(simple_points, 100.0)  # type: ignore
+        result = sa.best_segment_for_dist(simple_points, 100.0)  # type: ignore
         duration, start_time, end_time, _, _ = result  # type: ignore
         assert duration != float("inf"), "Should find a segment"
         assert start_time is not None
@@ -44,19 +44,36 @@ class TestBestSegmentForDist:
 
     def test_segment_ordering(self, simple_points):  # type: ignore
         """Segment should maintain chronological order."""
-        result = ahs.best_segment_for_dist(simple_points, 100.0)  # type: ignore
+        result = sa.best_segment_for_dist(simple_points, 100.0)  # type: ignore
         _, start_time, end_time, _, _ = result  # type: ignore
         assert start_time <= end_time
 
     def test_segment_unrealistic_distance(self, simple_points):  # type: ignore
         """Unrealistic distance should return infinity."""
-        result = ahs.best_segment_for_dist(simple_points, 100000000.0)  # type: ignore
+        result = sa.best_segment_for_dist(simple_points, 100000000.0)  # type: ignore
         duration, _, _, _, _ = result  # type: ignore
         assert duration == float("inf")
 
+    def test_segments_for_dists_match_single_distance(
+        self, simple_points
+    ):  # type: ignore
+        """Batching distances should give the same results as one at a time."""
+        targets = [100.0, 1000.0, 100000000.0]
+        debug_infos: list[dict[str, Any]] = [{} for _ in targets]
+        batched = sa.best_segments_for_dists(  # type: ignore
+            simple_points, targets, debug_infos=debug_infos
+        )
+        for target, result, debug_info in zip(targets, batched, debug_infos):
+            single_debug: dict[str, Any] = {}
+            single = sa.best_segment_for_dist(  # type: ignore
+                simple_points, target, debug_info=single_debug
+            )
+            assert result == single
+            assert debug_info == single_debug
+
     def test_segment_empty_points(self):
         """Empty points list should return infinity."""
-        result = ahs.best_segment_for_dist([], 100.0)  # type: ignore
+        result = sa.best_segment_for_dist([], 100.0)  # type: ignore
         duration, start_time, end_time, _, _ = result  # type: ignore
         assert duration == float("inf")
         assert start_time is None
@@ -84,10 +101,10 @@ class TestBestSegmentForDist:
             for i in range(50)
         ]
 
-        dur1, _, _, _, _ = ahs.best_segment_for_dist(  # type: ignore
+        dur1, _, _, _, _ = sa.best_segment_for_dist(  # type: ignore
             points1, 100.0, max_speed_kmh=20.0, penalty_seconds=3.0
         )
-        dur2, _, _, _, _ = ahs.best_segment_for_dist(  # type: ignore
+        dur2, _, _, _, _ = sa.best_segment_for_dist(  # type: ignore
             points2, 100.0, max_speed_kmh=20.0, penalty_seconds=3.0
         )
 
@@ -104,12 +121,35 @@ class TestBestSegmentForDist:
         ]
 
         debug_info = {}
-        ahs.best_segment_for_dist(points, 100.0, debug_info=debug_info)  # type: ignore
+        sa.best_segment_for_dist(points, 100.0, debug_info=debug_info)  # type: ignore
 
         assert "num_points" in debug_info
         assert "segment_dist" in debug_info
         assert "total_dist" in debug_info
 
+    def test_segment_debug_penalties_limited_to_best_window(self):
+        """Penalized intervals should only be reported for the winning segment."""
+        base_time = datetime(2024, 1, 1, 10, 0, 0)
+        # Two GPS jumps: one early in the route, one near the end
+        offsets = [0.0] * 60
+        offsets[5] = 0.0005
+        offsets[55] = 0.0005
+        points = [
+            (0.0, i * 0.0001 + offsets[i], 0.0, base_time + timedelta(seconds=i * 3))
+            for i in range(60)
+        ]
+
+        debug_info = {}
+        sa.best_segment_for_dist(  # type: ignore
+            points, 50.0, max_speed_kmh=20.0, penalty_seconds=3.0, debug_info=debug_info
+        )
+
+        best_i, best_j = debug_info["best_i"], debug_info["best_j"]
+        for seg_i, seg_j, penalties in debug_info["penalized_intervals"]:
+            assert (seg_i, seg_j) == (best_i, best_j)
+            for from_idx, to_idx, _, _, _ in penalties:
+                assert best_i <= from_idx < to_idx <= best_j
+
 
 class TestEdgeCases:
     """Tests for edge cases and error conditions."""
@@ -122,7 +162,7 @@ class TestEdgeCases:
             for i in range(10)
         ]
 
-        result = ahs.best_segment_for_dist(points, 0.0)  # type: ignore
+        result = sa.best_segment_for_dist(points, 0.0)  # type: ignore
         # Should handle it without crashing
         assert isinstance(result, tuple)
 
@@ -134,7 +174,7 @@ class TestEdgeCases:
             for i in range(10)
         ]
 
-        result = ahs.best_segment_for_dist(points, -100.0)  # type: ignore
+        result = sa.best_segment_for_dist(points, -100.0)  # type: ignore
         # Should handle it without crashing
         assert isinstance(result, tuple)
 
@@ -143,7 +183,7 @@ class TestEdgeCases:
         base_time = datetime(2024, 1, 1, 10, 0, 0)
         points = [(0.0, 0.0, 0.0, base_time)]
 
-        result = ahs.best_segment_for_dist(points, 100.0)  # type: ignore
+        result = sa.best_segment_for_dist(points, 100.0)  # type: ignore
         duration, _, _, _, _ = result  # type: ignore
         assert duration == float("inf")
 
@@ -155,7 +195,7 @@ class TestEdgeCases:
             (0.0, 0.0, 0.0, base_time + timedelta(seconds=10)),
         ]
 
-        result = ahs.best_segment_for_dist(points, 100.0)  # type: ignore
+        result = sa.best_segment_for_dist(points, 100.0)  # type: ignore
         # Should not crash
         assert isinstance(result, tuple)
 
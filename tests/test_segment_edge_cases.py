@@ -4,7 +4,7 @@
 
 import os
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from typing import cast, Any
 
 import pytest
@@ -62,6 +62,150 @@ class TestSegmentAnalysisEdgeCases:
 
         assert len(penalty_messages) > 0  # type: ignore
 
+    def test_collect_penalty_messages_keeps_first_per_timestamp(self):
+        """Duplicate timestamps keep the first message; bad indexes are unknown."""
+        points = [
+            (0.0, 0.0, 0.0, datetime(2024, 1, 1, 10, 0, 0)),
+            (0.0, 0.0, 0.0, datetime(2024, 1, 1, 10, 0, 0)),
+        ]
+        penalty_messages = {}
+        penalty_data = [
+            (0, 1, [(0, 1, 1.0, 30.0, 10.0), (1, 2, 2.0, 40.0, 20.0)]),
+            (5, 6, [(5, 6, 3.0, 50.0, 30.0)]),
+        ]
+
+        sa.collect_penalty_messages(penalty_data, points, penalty_messages)  # type: ignore
+
+        assert penalty_messages == {
+            "01/01/2024 10:00:00": (
+                "01/01/2024 10:00:00 | interval 0->1 | 1.00s | 30.0 km/h"
+            ),
+            "unknown": "unknown | interval 5->6 | 3.00s | 50.0 km/h",
+        }
+
+    def test_collect_penalty_messages_uses_workout_offset(self):
+        """Message timestamps should be shown in the given UTC offset."""
+        points = [
+            (0.0, 0.0, 0.0, datetime(2024, 1, 1, 10, 0, 0, tzinfo=timezone.utc)),
+            (0.0, 0.0, 0.0, datetime(2024, 1, 1, 10, 0, 5, tzinfo=timezone.utc)),
+        ]
+        penalty_messages = {}
+        penalty_data = [(0, 1, [(0, 1, 5.0, 25.0, 100.0)])]
+        offset = timezone(timedelta(hours=2))
+
+        sa.collect_penalty_messages(  # type: ignore
+            penalty_data, points, penalty_messages, offset
+        )
+
+        assert list(penalty_messages) == ["01/01/2024 12:00:00"]
+
+    def test_points_to_arrays_columns(self):
+        """Should split tuples into float64 columns with POSIX second timestamps."""
+        points = [
+            (1.0, 2.0, 3.0, datetime(2024, 1, 1, 10, 0, 0, tzinfo=timezone.utc)),
+            (4.0, 5.0, 6.0, datetime(2024, 1, 1, 10, 0, 10)),
+        ]
+
+        arrays = sa.points_to_arrays(points)  # type: ignore
+
+        assert arrays.lat.tolist() == [1.0, 4.0]  # type: ignore
+        assert arrays.lon.tolist() == [2.0, 5.0]  # type: ignore
+        assert arrays.ele.tolist() == [3.0, 6.0]  # type: ignore
+        # Naive timestamps are interpreted as UTC
+        assert arrays.ts[1] - arrays.ts[0] == 10.0  # type: ignore
+
+    def test_sort_points_by_time_reorders_all_columns(self):
+        """Sorting should keep each sample's columns aligned."""
+        points = sa.points_to_arrays(  # type: ignore
+            [
+                (2.0, 2.0, 2.0, datetime(2024, 1, 1, 10, 0, 20)),
+                (0.0, 0.0, 0.0, datetime(2024, 1, 1, 10, 0, 0)),
+                (1.0, 1.0, 1.0, datetime(2024, 1, 1, 10, 0, 10)),
+            ]
+        )
+
+        ordered = sa.sort_points_by_time(points)  # type: ignore
+
+        assert ordered.lat.tolist() == [0.0, 1.0, 2.0]  # type: ignore
+        assert ordered.ele.tolist() == [0.0, 1.0, 2.0]  # type: ignore
+        assert list(ordered.ts) == sorted(points.ts)  # type: ignore
+
+    def test_sort_points_by_time_keeps_sorted_input(self):
+        """Already chronological columns should be returned unchanged."""
+        points = sa.PointArrays(
+            sa.np.array([1.0, 2.0]),
+            sa.np.array([3.0, 4.0]),
+            sa.np.array([5.0, 6.0]),
+            sa.np.array([10.0, 10.0]),
+        )
+
+        assert sa.sort_points_by_time(points) is points  # type: ignore
+
+    def test_sweep_matches_compiled_path(self):
+        """Pure-Python sweep and _find_best_segment should agree."""
+        cum = [0.0, 40.0, 90.0, 130.0, 200.0]
+        cum_adj_time = [0.0, 10.0, 30.0, 35.0, 60.0]
+
+        expected = sa._sweep(cum, cum_adj_time, 90.0)  # type: ignore
+        result = sa._find_best_segment(  # type: ignore
+            sa.np.array(cum), sa.np.array(cum_adj_time), 90.0
+        )
+
+        assert expected == (25.0, 1, 3)
+        assert result == expected
+
+    def test_sweep_vectorized_matches_two_pointer(self):
+        """searchsorted windows should match the two-pointer scan exactly."""
+        cum = [0.0, 0.1, 0.4, 0.4, 1.0, 1.3, 2.0]
+        cum_adj_time = [0.0, 1.0, 2.0, 2.0, 1.5, 4.0, 6.0]
+        for target in (-1.0, 0.0, 0.3, 0.6, 1.0, 2.0, 5.0):
+            expected = sa._sweep(cum, cum_adj_time, target)  # type: ignore
+            result = sa._sweep_vectorized(  # type: ignore
+                sa.np.array(cum), sa.np.array(cum_adj_time), target
+            )
+            assert result == expected, target
+        empty = sa.np.zeros(0)
+        assert sa._sweep_vectorized(empty, empty, 1.0) == (float("inf"), -1, -1)
+
+    def test_targets_longer_than_route_skip_sweep(self, monkeypatch):
+        """Targets beyond the route's total distance should not be scanned."""
+        points = sa.PointArrays(
+            sa.np.array([0.0, 0.001]),
+            sa.np.zeros(2),
+            sa.np.zeros(2),
+            sa.np.array([0.0, 30.0]),
+        )
+        scanned = []
+        find_best_segment = sa._find_best_segment
+
+        def spy(cum, cum_adj_time, target_m):  # type: ignore
+            scanned.append(target_m)
+            return find_best_segment(cum, cum_adj_time, target_m)
+
+        monkeypatch.setattr(sa, "_find_best_segment", spy)
+        results = sa.best_segments_for_dists(points, [100.0, 1000.0])  # type: ignore
+
+        assert scanned == [100.0]
+        assert results[0][0] == 30.0
+        assert results[1] == (float("inf"), None, None, 0.0, 0.0)
+
+    def test_compute_intervals_penalizes_only_timed_fast_moves(self):
+        """Fast intervals get the penalty; zero-duration jumps do not."""
+        points = sa.PointArrays(
+            sa.np.array([0.0, 0.0001, 0.001, 0.002, 0.002]),
+            sa.np.zeros(5),
+            sa.np.zeros(5),
+            sa.np.array([0.0, 10.0, 11.0, 11.0, 21.0]),
+        )
+
+        _, cum_adj_time, intervals = sa._compute_intervals(  # type: ignore
+            points, 20.0, 3.0, collect_debug=True
+        )
+
+        assert intervals["time"].tolist() == [0.0, 10.0, 1.0, 0.0, 10.0]
+        assert intervals["adj_time"].tolist() == [0.0, 10.0, 4.0, 0.0, 10.0]
+        assert cum_adj_time[-1] == 24.0
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -50,6 +50,48 @@ class TestParseTimestamp:
             result = ep.parse_timestamp(fmt)  # type: ignore
             assert isinstance(result, datetime), f"Failed to parse: {fmt}"
 
+    def test_fast_formats_match_dateutil(self):
+        """Known layouts should parse to the same instant as dateutil."""
+        samples = [
+            "2021-12-26 08:15:30 +0100",
+            "2024-01-15T10:30:45Z",
+            "2024-01-15T10:30:45.250+02:00",
+            "2024-01-15T10:30:45.250Z",
+        ]
+        for sample in samples:
+            result = ep.parse_timestamp(sample)  # type: ignore
+            expected = ep.dateutil_parser.parse(sample)  # type: ignore
+            assert result == expected  # type: ignore
+            assert result.utcoffset() == expected.utcoffset()  # type: ignore
+
+    def test_iso_offset_rewrites_apple_and_gpx_offsets(self):
+        """Offsets should be rewritten into the form older fromisoformat takes."""
+        assert ep._iso_offset("2021-12-26 08:15:30 +0100") == (  # type: ignore
+            "2021-12-26 08:15:30+01:00"
+        )
+        assert ep._iso_offset("2024-01-15T10:30:45-0530") == (  # type: ignore
+            "2024-01-15T10:30:45-05:30"
+        )
+        assert ep._iso_offset("2024-01-15T10:30:45Z") == (  # type: ignore
+            "2024-01-15T10:30:45+00:00"
+        )
+        assert ep._iso_offset("2024-01-15 10:30:45 UTC") == (  # type: ignore
+            "2024-01-15 10:30:45 UTC"
+        )
+
+    def test_pre_311_path_matches_dateutil(self, monkeypatch):  # type: ignore
+        """Without the 3.11 fromisoformat, known layouts should still agree."""
+        monkeypatch.setattr(ep, "_FROMISOFORMAT_ALL_LAYOUTS", False)
+        ep.parse_timestamp.cache_clear()  # type: ignore
+        try:
+            for sample in ("2021-12-26 08:15:30 +0100", "2024-01-15T10:30:45Z"):
+                result = ep.parse_timestamp(sample)  # type: ignore
+                expected = ep.dateutil_parser.parse(sample)  # type: ignore
+                assert result == expected  # type: ignore
+                assert result.utcoffset() == expected.utcoffset()  # type: ignore
+        finally:
+            ep.parse_timestamp.cache_clear()  # type: ignore
+
     def test_parse_empty_string_raises(self):
         """Empty string should raise ValueError."""
         with pytest.raises(ValueError):
@@ -16,17 +16,34 @@ Notes:
 from __future__ import annotations
 
 import argparse
+import heapq
+import io
+import itertools
 import math
+import os
+import sys
 import xml.etree.ElementTree as ET
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, date
-from typing import Iterable, List, Tuple, Any, Dict
+from operator import itemgetter
+from typing import BinaryIO, Iterable, Iterator, List, Tuple, Any, Dict
+
+import numpy as np
 
 from export_processor import (
     ExportReader,
     match_routes_to_workouts,
     stream_points_from_route,
 )
-from segment_analysis import best_segment_for_dist, collect_penalty_messages
+from segment_analysis import (
+    PointArrays,
+    best_segments_for_dists,
+    collect_penalty_messages,
+    datetime_to_seconds,
+    sort_points_by_time,
+)
+from route_cache import RouteCache
 from time_estimation import estimate_optimal_time, format_estimation_confidence
 
 try:
@@ -35,26 +52,89 @@ except ImportError:
     tqdm = None
 
 DATE_FMT = "%d/%m/%Y"
+# Workout whose 400 m segment is traced by --debug
+_DEBUG_TARGET_DATE = date(2021, 12, 26)
+
+# Per-process archive handle used by worker processes (see _init_worker)
+_worker_reader: ExportReader | None = None
+
+# Decoded route files kept in memory per archive handle (see _load_route_file)
+_ROUTE_MEMO_SIZE = 256
+# Route files up to this decompressed size are read whole; larger ones stream
+_BUFFERED_ROUTE_MAX = 1 << 22
+
+
+def _load_route_file(
+    reader: ExportReader, ref: str, cache: RouteCache | None = None
+) -> PointArrays | None:
+    """Load one route file into column arrays, or None if it has no points."""
+    if cache is not None:
+        cached = cache.load_points(ref)
+        if cached is not None:
+            return cached if len(cached.ts) else None
+    lats, lons, eles, times = array("d"), array("d"), array("d"), array("d")
+    # Resolution is memoized by the reader and already tries ref without "/"
+    z_path = reader.resolve_zip_path(ref)
+    if not z_path:
+        return None
+    memo = reader.route_memo
+    if z_path in memo:
+        memo.move_to_end(z_path)
+        points = memo[z_path]
+        return points if len(points.ts) else None
+    try:
+        if reader.entry_size(z_path) <= _BUFFERED_ROUTE_MAX:
+            # Most routes are small; one read avoids many short decompressed reads
+            data: BinaryIO = io.BytesIO(reader.read_entry(z_path))
+        else:
+            # Large routes are parsed as they decompress, never held whole
+            data = reader.open_entry(z_path)
+        with data:
+            for lat, lon, ele, ts in stream_points_from_route(data):
+                seconds = datetime_to_seconds(ts)
+                lats.append(lat)
+                lons.append(lon)
+                eles.append(ele)
+                times.append(seconds)
+    except (KeyError, ET.ParseError, ValueError, TypeError):
+        pass  # keep the samples read before the file turned out malformed
+    points = PointArrays(
+        np.frombuffer(lats, dtype=np.float64),
+        np.frombuffer(lons, dtype=np.float64),
+        np.frombuffer(eles, dtype=np.float64),
+        np.frombuffer(times, dtype=np.float64),
+    )
+    for column in points:
+        column.flags.writeable = False  # shared by every workout using the route
+    memo[z_path] = points
+    if len(memo) > _ROUTE_MEMO_SIZE:
+        memo.popitem(last=False)
+    if cache is not None:
+        cache.store_points(ref, points)
+    return points if times else None
 
 
 def _load_workout_points(
-    reader: ExportReader, refs: set[str]
-) -> List[Tuple[float, float, float, datetime]]:
-    """Load GPS points from workout route files."""
-    points: List[Tuple[float, float, float, datetime]] = []
-    for ref in refs:
-        try:
-            z_path = reader.resolve_zip_path(ref)
-            if not z_path:
-                z_path = reader.resolve_zip_path(ref.lstrip("/") if ref else ref)
-                if not z_path:
-                    continue
-            with reader.zipfile.open(z_path) as rf:
-                for lat, lon, ele, ts in stream_points_from_route(rf):  # type: ignore
-                    points.append((lat, lon, ele, ts))
-        except (KeyError, ET.ParseError, ValueError, TypeError):
-            continue
-    return points
+    reader: ExportReader, refs: List[str], cache: RouteCache | None = None
+) -> PointArrays:
+    """Load GPS points from workout route files into column arrays.
+
+    Files are read in archive order and concatenated in order of their first
+    sample, so routes that follow each other need no sorting afterwards.
+    """
+    ordered = sorted(refs, key=reader.archive_offset)
+    segments = [
+        segment
+        for segment in (_load_route_file(reader, ref, cache) for ref in ordered)
+        if segment is not None
+    ]
+    if not segments:
+        empty = np.empty(0, dtype=np.float64)
+        return PointArrays(empty, empty, empty, empty)
+    if len(segments) == 1:
+        return segments[0]
+    segments.sort(key=lambda segment: segment.ts[0])
+    return PointArrays._make(np.concatenate(columns) for columns in zip(*segments))
 
 
 def _log_debug_segment(
@@ -69,7 +149,7 @@ def _log_debug_segment(
         return
     if not math.isclose(d, 400.0):
         return
-    if workout_date.strftime(DATE_FMT) != "26/12/2021":
+    if workout_date.date() != _DEBUG_TARGET_DATE:
         return
     segment_dist = debug_info.get("segment_dist", "N/A")  # type: ignore
     num_points = debug_info.get("num_points", "N/A")  # type: ignore
@@ -81,33 +161,52 @@ def _log_debug_segment(
     )
 
 
-def _process_distance(
-    d: float,
-    points: List[Tuple[float, float, float, datetime]],
+def _process_distances(
+    distances_m: List[float],
+    points: PointArrays,
     workout_date: datetime | None,
     best_segments: Dict[float, List[Tuple[float, datetime | None, float, float]]],
     penalty_messages: Dict[str, str],
     config: Dict[str, Any],
 ) -> None:
-    """Process a single distance for the workout."""
+    """Process every distance for the workout over one pass of its intervals."""
     max_speed_kmh = config.get("max_speed_kmh", 20.0)
     penalty_seconds = config.get("penalty_seconds", 3.0)
     debug = config.get("debug", False)
     verbose = config.get("verbose", False)
 
-    debug_info: Dict[str, Any] | None = {} if debug or verbose else None
-    duration, s, _, elevation_change, avg_speed = best_segment_for_dist(
-        points, d, max_speed_kmh, penalty_seconds, debug_info
+    # Debug output only traces one workout; penalties need every workout
+    traced = (
+        debug
+        and workout_date is not None
+        and workout_date.date() == _DEBUG_TARGET_DATE
     )
-    if duration != float("inf") and s:
-        best_segments[d].append((duration, workout_date, elevation_change, avg_speed))
-        _log_debug_segment(debug, workout_date, d, duration, debug_info)
-    if (
-        verbose
-        and debug_info is not None
-        and (penalized_intervals_data := debug_info.get("penalized_intervals"))
-    ):  # type: ignore
-        collect_penalty_messages(penalized_intervals_data, points, penalty_messages)
+    debug_infos: List[Dict[str, Any]] | None = (
+        [{} for _ in distances_m] if traced or verbose else None
+    )
+    segments = best_segments_for_dists(
+        points, distances_m, max_speed_kmh, penalty_seconds, debug_infos
+    )
+    for k, (d, segment) in enumerate(zip(distances_m, segments)):
+        duration, s, _, elevation_change, avg_speed = segment
+        debug_info = debug_infos[k] if debug_infos is not None else None
+        if duration != float("inf") and s:
+            best_segments[d].append(
+                (duration, workout_date, elevation_change, avg_speed)
+            )
+            if debug:
+                _log_debug_segment(debug, workout_date, d, duration, debug_info)
+        if (
+            verbose
+            and debug_info is not None
+            and (penalized_intervals_data := debug_info.get("penalized_intervals"))
+        ):  # type: ignore
+            collect_penalty_messages(
+                penalized_intervals_data,
+                points,
+                penalty_messages,
+                workout_date.tzinfo if workout_date is not None else None,
+            )
 
 
 def _should_skip_workout(
@@ -123,40 +222,133 @@ def _should_skip_workout(
     return False
 
 
+def _select_workouts(
+    workout_to_files: Dict[str, List[str]],
+    running_workouts: Dict[str, Dict[str, datetime | None]],
+    start_date: date | None,
+    end_date: date | None,
+) -> List[Tuple[str, List[str], datetime | None]]:
+    """Resolve workout dates and drop workouts outside the date filters.
+
+    Runs before any route file is opened so filtered workouts cost nothing.
+    """
+    selected: List[Tuple[str, List[str], datetime | None]] = []
+    for workout_ref, refs in workout_to_files.items():
+        wd = running_workouts.get(workout_ref)
+        workout_date = wd.get("start") if isinstance(wd, dict) else wd
+        if not _should_skip_workout(workout_date, start_date, end_date):
+            selected.append((workout_ref, refs, workout_date))
+    return selected
+
+
 def _process_workout(
     reader: ExportReader,
-    workout_ref: str,
-    refs: set[str],
-    running_workouts: Dict[str, Dict[str, datetime | None]],
+    refs: List[str],
+    workout_date: datetime | None,
     distances_m: List[float],
     results: Dict[float, List[Tuple[float, datetime | None, float, float]]],
     penalty_messages: Dict[str, str],
     config: Dict[str, Any],
 ) -> None:
     """Process a single workout and update results."""
-    wd = running_workouts.get(workout_ref)
-    workout_date = wd.get("start") if isinstance(wd, dict) else wd
-
-    if _should_skip_workout(
-        workout_date, config.get("start_date"), config.get("end_date")
-    ):
+    points = _load_workout_points(reader, refs, config.get("route_cache"))
+    if not len(points.ts):
         return
 
-    points = _load_workout_points(reader, refs)
-    if not points:
-        return
+    points = sort_points_by_time(points)
 
-    points.sort(key=lambda x: x[3])  # type: ignore
+    _process_distances(
+        distances_m, points, workout_date, results, penalty_messages, config
+    )
 
-    for d in distances_m:
-        _process_distance(d, points, workout_date, results, penalty_messages, config)
+
+def _init_worker(zip_path: str) -> None:
+    """Open the export once in each worker process."""
+    global _worker_reader  # pylint: disable=global-statement
+    _worker_reader = ExportReader(zip_path)
+
+
+def _workout_outcome(
+    reader: ExportReader,
+    refs: List[str],
+    workout_date: datetime | None,
+    distances_m: List[float],
+    config: Dict[str, Any],
+) -> Tuple[
+    Dict[float, List[Tuple[float, datetime | None, float, float]]], Dict[str, str]
+]:
+    """Process one workout and return its segments and penalties."""
+    results: Dict[float, List[Tuple[float, datetime | None, float, float]]] = {
+        d: [] for d in distances_m
+    }
+    penalty_messages: Dict[str, str] = {}
+    _process_workout(
+        reader,
+        refs,
+        workout_date,
+        distances_m,
+        results,
+        penalty_messages,
+        config,
+    )
+    return results, penalty_messages
+
+
+def _process_workout_in_worker(
+    refs: List[str],
+    workout_date: datetime | None,
+    distances_m: List[float],
+    config: Dict[str, Any],
+) -> Tuple[
+    Dict[float, List[Tuple[float, datetime | None, float, float]]], Dict[str, str]
+]:
+    """Process one workout in a worker and return its segments and penalties."""
+    assert _worker_reader is not None
+    return _workout_outcome(_worker_reader, refs, workout_date, distances_m, config)
+
+
+def _keep_fastest(
+    heaps: Dict[float, List[Tuple[float, int, Tuple[Any, ...]]]],
+    results: Dict[float, List[Tuple[float, datetime | None, float, float]]],
+    top_n: int,
+    arrivals: Iterator[int],
+) -> None:
+    """Fold one workout's segments into bounded per-distance max-heaps.
+
+    Entries are (-duration, -arrival, segment), so the root is the slowest
+    kept segment and, among equal durations, the latest to arrive. This keeps
+    the same top_n as a stable sort of every segment would.
+    """
+    for d, segs in results.items():
+        heap = heaps[d]
+        for seg in segs:
+            entry = (-seg[0], -next(arrivals), seg)
+            if len(heap) < top_n:
+                heapq.heappush(heap, entry)
+            elif heap and entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+
+def _resolve_workers(workers: int | None) -> int:
+    """Return the worker count to use; 0 or less means one per CPU."""
+    if workers is None:
+        return 1
+    if workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def _worker_chunksize(num_workouts: int, workers: int) -> int:
+    """Return how many workouts to send to a worker at a time."""
+    chunksize, extra = divmod(num_workouts, workers * 4)
+    return chunksize + 1 if extra else max(chunksize, 1)
 
 
 def _print_debug_info(
     debug: bool,
     running_workouts: Dict[str, Dict[str, datetime | None]],
     routes: List[Tuple[datetime | None, datetime | None, List[str]]],
-    workout_to_files: Dict[str, set[str]],
+    workout_to_files: Dict[str, List[str]],
 ) -> None:
     """Print debug information."""
     if not debug:
@@ -170,10 +362,16 @@ def _print_debug_info(
         print(f"DEBUG: workout {k} -> {list(v)[:3]}")
 
 
-def _get_progress_iterable(iterable: Any, progress: bool, debug: bool) -> Any:
+def _get_progress_iterable(
+    iterable: Any, progress: bool, debug: bool, total: int | None = None
+) -> Any:
     """Wrap iterable with progress bar if available."""
     if progress and tqdm is not None:
-        return tqdm(list(iterable), desc="Workouts")
+        if total is None:
+            if not hasattr(iterable, "__len__"):
+                iterable = list(iterable)
+            total = len(iterable)
+        return tqdm(iterable, total=total, desc="Workouts")
     if progress and tqdm is None and debug:
         print("DEBUG: tqdm not installed, progress disabled")
     return iterable
@@ -186,53 +384,115 @@ def _finalize_results(
     """Sort and trim results to top N."""
     results: Dict[float, List[Tuple[float, datetime | None, float, float]]] = {}
     for d, segs in best_segments.items():
-        segs.sort(key=lambda x: x[0])  # type: ignore
+        segs.sort(key=itemgetter(0))  # type: ignore
         results[d] = segs[:top_n]
     return results
 
 
 def _load_export_data(
-    reader: ExportReader,
+    reader: ExportReader, debug: bool = False, cache: RouteCache | None = None
 ) -> Tuple[
     Dict[str, Dict[str, datetime | None]],
     List[Tuple[datetime | None, datetime | None, List[str]]],
-    Dict[str, set[str]],
+    Dict[str, List[str]],
 ]:
     """Load workouts, routes, and match them."""
-    export_xml_name = reader.find_export_xml()
-    running_workouts = reader.collect_running_workouts(export_xml_name)
-    routes = reader.collect_routes(export_xml_name)
-    if not routes:
-        routes = reader.collect_routes_fallback(export_xml_name)
+    index = cache.load_index() if cache is not None else None
+    if index is not None:
+        if debug:
+            print(f"DEBUG: using cached export index in {cache.directory}")
+        running_workouts, routes = index
+    else:
+        export_xml_name = reader.find_export_xml()
+        running_workouts, routes = reader.scan_export(export_xml_name)
+        if not routes:
+            if debug:
+                print("DEBUG: no routes from XML parse, trying text fallback")
+            routes = reader.collect_routes_fallback(export_xml_name)
+        if cache is not None:
+            cache.store_index(running_workouts, routes)
     workout_to_files = match_routes_to_workouts(routes, running_workouts)
     return running_workouts, routes, workout_to_files
 
 
 def _process_all_workouts(
     reader: ExportReader,
-    workout_to_files: Dict[str, set[str]],
+    workout_to_files: Dict[str, List[str]],
     running_workouts: Dict[str, Dict[str, datetime | None]],
     distances_m: List[float],
     best_segments: Dict[float, List[Tuple[float, datetime | None, float, float]]],
     penalty_messages: Dict[str, str],
     config: Dict[str, Any],
+    top_n: int,
 ) -> None:
-    """Process all workouts with progress tracking."""
+    """Process all workouts with progress tracking.
+
+    Only the top_n fastest segments per distance are kept while workouts are
+    processed; they are added to best_segments fastest first.
+    """
+    selected = _select_workouts(
+        workout_to_files,
+        running_workouts,
+        config.get("start_date"),
+        config.get("end_date"),
+    )
+    workers = min(_resolve_workers(config.get("workers")), len(selected))
+    if workers > 1:
+        outcomes = _process_workouts_parallel(
+            reader.zip_path, selected, distances_m, config, workers
+        )
+    else:
+        outcomes = (
+            _workout_outcome(reader, refs, workout_date, distances_m, config)
+            for _, refs, workout_date in selected
+        )
     iterable = _get_progress_iterable(
-        workout_to_files.items(),
+        outcomes,
         config.get("progress", False),
         config.get("debug", False),
+        total=len(selected),
     )
-    for workout_ref, refs in iterable:
-        _process_workout(
-            reader,
-            workout_ref,
-            refs,
-            running_workouts,
-            distances_m,
-            best_segments,
-            penalty_messages,
-            config,
+    heaps: Dict[float, List[Tuple[float, int, Tuple[Any, ...]]]] = {
+        d: [] for d in best_segments
+    }
+    arrivals = itertools.count()
+    for results, messages in iterable:
+        _keep_fastest(heaps, results, top_n, arrivals)
+        for key, msg in messages.items():
+            penalty_messages.setdefault(key, msg)
+    for d, heap in heaps.items():
+        best_segments[d].extend(seg for _, _, seg in sorted(heap, reverse=True))
+
+
+def _process_workouts_parallel(
+    zip_path: str,
+    selected: List[Tuple[str, List[str], datetime | None]],
+    distances_m: List[float],
+    config: Dict[str, Any],
+    workers: int,
+) -> Iterator[
+    Tuple[
+        Dict[float, List[Tuple[float, datetime | None, float, float]]],
+        Dict[str, str],
+    ]
+]:
+    """Process workouts across worker processes.
+
+    Outcomes are yielded in selection order so output matches a sequential run.
+    Workouts are sent in batches, about four per worker, to cut pickling and
+    IPC round trips without leaving workers idle behind one long batch.
+    """
+    chunksize = _worker_chunksize(len(selected), workers)
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(zip_path,)
+    ) as executor:
+        yield from executor.map(
+            _process_workout_in_worker,
+            [refs for _, refs, _ in selected],
+            [workout_date for _, _, workout_date in selected],
+            [distances_m] * len(selected),
+            [config] * len(selected),
+            chunksize=chunksize,
         )
 
 
@@ -250,6 +510,9 @@ def process_export(
     """
     if config is None:
         config = {}
+    if config.get("cache"):
+        cache = RouteCache(zip_path, config.get("cache_dir"))
+        config = {**config, "route_cache": cache}
 
     distances_m = list(distances_m)
     best_segments: Dict[float, List[Tuple[float, datetime | None, float, float]]] = {
@@ -258,7 +521,9 @@ def process_export(
     penalty_messages: Dict[str, str] = {}
 
     with ExportReader(zip_path) as reader:
-        running_workouts, routes, workout_to_files = _load_export_data(reader)
+        running_workouts, routes, workout_to_files = _load_export_data(
+            reader, config.get("debug", False), config.get("route_cache")
+        )
         _print_debug_info(
             config.get("debug", False), running_workouts, routes, workout_to_files
         )
@@ -270,6 +535,7 @@ def process_export(
             best_segments,
             penalty_messages,
             config,
+            top_n,
         )
 
     return _finalize_results(best_segments, top_n), penalty_messages
@@ -354,6 +620,12 @@ def _add_basic_args(parser: argparse.ArgumentParser) -> None:
         help="Write penalty messages to this text file (also prints to screen)",
     )
     parser.add_argument("--debug", action="store_true", help="Show debug messages")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes for route analysis (0 = one per CPU; default: 1)",
+    )
 
 
 def _add_speed_args(parser: argparse.ArgumentParser) -> None:
@@ -415,7 +687,24 @@ def _add_filter_args(parser: argparse.ArgumentParser) -> None:
         action="store_false",
         help="Disable estimated optimal time display",
     )
-    parser.set_defaults(progress=True)
+    parser.add_argument(
+        "--cache",
+        dest="cache",
+        action="store_true",
+        help="Reuse parsed workouts and routes from previous runs on the same zip",
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="cache",
+        action="store_false",
+        help="Parse the export from scratch (default)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Cache location (default: $XDG_CACHE_HOME or ~/.cache, "
+        "under apple_health_segments)",
+    )
+    parser.set_defaults(progress=True, cache=False)
 
 
 def _add_cli_arguments(parser: argparse.ArgumentParser) -> None:
@@ -461,8 +750,9 @@ def _format_date_string(workout_dt: datetime | None) -> str:
     if not workout_dt:
         return "unknown"
     try:
-        return workout_dt.strftime("%d/%m/%Y")
-    except (AttributeError, ValueError):
+        # Same DATE_FMT layout, built without strftime's format parsing
+        return f"{workout_dt.day:02d}/{workout_dt.month:02d}/{workout_dt.year:04d}"
+    except AttributeError:
         return workout_dt.isoformat()
 
 
@@ -525,8 +815,7 @@ def _write_output_file(filepath: str, lines: List[str]) -> None:
     """Write lines to output file."""
     try:
         with open(filepath, "w", encoding="utf-8") as fh:
-            for line in lines:
-                fh.write(line + "\n")
+            fh.writelines(f"{line}\n" for line in lines)
     except OSError as e:
         print(f"Error writing file: {e}")
 
@@ -549,6 +838,9 @@ def main():
         "verbose": args.verbose,
         "start_date": start_date,
         "end_date": end_date,
+        "workers": args.workers,
+        "cache": args.cache,
+        "cache_dir": args.cache_dir,
     }
     results, penalty_messages = process_export(
         args.zip, args.distances, top_n=args.top, config=config
@@ -557,10 +849,7 @@ def main():
     penalty_lines = _format_penalty_lines(penalty_messages)
     out_lines = _format_results_lines(results, show_estimation=args.show_estimation)
 
-    for line in penalty_lines:
-        print(line)
-    for line in out_lines:
-        print(line)
+    sys.stdout.writelines(f"{line}\n" for line in (*penalty_lines, *out_lines))
 
     if args.penalty_file and penalty_messages:
         _write_output_file(args.penalty_file, penalty_lines)
@@ -2,23 +2,105 @@
 
 from __future__ import annotations
 
+import io
 import re
+import sys
 import zipfile
-from collections import defaultdict
+from bisect import bisect_right
+from collections import OrderedDict
+from functools import lru_cache
 from datetime import datetime
 from typing import List, Tuple, Dict, BinaryIO, Iterable, Any
 from dateutil import parser as dateutil_parser
 
+from xml.etree.ElementTree import ParseError
+
 try:
     from defusedxml.ElementTree import iterparse
 except ImportError:
     from xml.etree.ElementTree import iterparse
 
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+# Text-based fallback patterns, applied to the raw export bytes
+_WORKOUT_ROUTE_RE = re.compile(
+    rb"<WorkoutRoute\b([^>]*)>(.*?)</WorkoutRoute>", re.DOTALL
+)
+_ROUTE_ATTR_RE = re.compile(rb'\b(startDate|endDate|creationDate)="([^"]+)"')
+_FILE_REF_RE = re.compile(rb'<FileReference[^>]*path="([^"]+)"')
+_ROUTE_OPEN_TAG = b"<WorkoutRoute"
+# Bytes read per step by the text fallback, which scans the export in chunks
+_FALLBACK_CHUNK_SIZE = 1 << 20
+# Buffer between the inflating zip stream and the export.xml parser
+_EXPORT_BUFFER_SIZE = 1 << 20
+
+# key=value fields of line-based route files; quoted values may contain spaces
+_LINE_FIELD_KEYS = (b"latitude", b"longitude", b"altitude", b"timestamp")
+_LINE_FIELD_RE = re.compile(
+    rb"(?<![^\s\"'])(latitude|longitude|altitude|timestamp)[^\s\"'=]*="
+    rb"(?:\"([^\"]*)\"|'([^']*)'|([^\s\"'=>]*))"
+)
+
+RUNNING_ACTIVITY_TYPE = "HKWorkoutActivityTypeRunning"
+
+# Local tag names recognised inside route files, mapped to how they are handled
+_ROUTE_TAG_KINDS = {
+    "Location": "location",
+    "location": "location",
+    "trkpt": "trkpt",
+    "trkPoint": "trkpt",
+    "time": "time",
+    "ele": "ele",
+    "elevation": "ele",
+}
+
+# Point elements handed out by lxml's iterparse; other tags never reach Python
+_LXML_POINT_TAGS = ("{*}Location", "{*}location", "{*}trkpt", "{*}trkPoint")
+
+# Layouts written by Apple Health (export.xml, Location files) and GPX routes
+_TIMESTAMP_FORMATS = (
+    "%Y-%m-%d %H:%M:%S %z",
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y-%m-%dT%H:%M:%S.%f%z",
+)
+
+
+# From 3.11 fromisoformat accepts "Z", "+0000" and a space before the offset,
+# which covers every layout above in C without a format string
+_FROMISOFORMAT_ALL_LAYOUTS = sys.version_info >= (3, 11)
+
+
+def _iso_offset(s: str) -> str:
+    """Rewrite a trailing "Z" or " +HHMM" offset as "+HH:MM".
+
+    Older fromisoformat only accepts that offset form; other strings are
+    returned unchanged.
+    """
+    if s.endswith("Z"):
+        return s[:-1] + "+00:00"
+    if len(s) > 5 and s[-5] in "+-" and s[-4:].isdigit():
+        return f"{s[:-5].rstrip()}{s[-5:-2]}:{s[-2:]}"
+    return s
+
 
+@lru_cache(maxsize=4096)
 def parse_timestamp(s: str) -> datetime:
-    """Parse timestamp string using dateutil for robust format handling."""
+    """Parse timestamp string, trying known layouts before dateutil."""
     if not s:
         raise ValueError("Empty timestamp")
+    iso = s if _FROMISOFORMAT_ALL_LAYOUTS else _iso_offset(s)
+    try:
+        return datetime.fromisoformat(iso)
+    except ValueError:
+        pass
+    for fmt in _TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(s, fmt)
+        except ValueError:
+            pass
     return dateutil_parser.parse(s)
 
 
@@ -45,6 +127,37 @@ def _parse_location_element(elem: Any) -> Tuple[float, float, float, datetime] |
     return None
 
 
+def _location_keys(elem: Any) -> Tuple[str, str, str, str]:
+    """Return the lat, lon, elevation and timestamp attribute names used by elem."""
+    attrib = elem.attrib
+    return (
+        "latitude" if "latitude" in attrib else "lat",
+        "longitude" if "longitude" in attrib else "lon",
+        "altitude" if "altitude" in attrib else "ele",
+        "timestamp" if "timestamp" in attrib else "time",
+    )
+
+
+def _parse_location_with_keys(
+    elem: Any, keys: Tuple[str, str, str, str]
+) -> Tuple[float, float, float, datetime] | None:
+    """Parse Location element using the attribute names seen earlier in the file."""
+    lat_key, lon_key, ele_key, ts_key = keys
+    get = elem.get
+    lat, lon, ts = get(lat_key), get(lon_key), get(ts_key)
+    if not (lat and lon and ts):
+        # Element deviates from the file's schema; probe all names
+        return _parse_location_element(elem)
+    # Elevation is optional, so its absence does not trigger the probe above;
+    # fall back to either name for points that use a different one
+    ele = get(ele_key) or get("altitude") or get("ele")
+    try:
+        elevation = float(ele) if ele else 0.0
+        return float(lat), float(lon), elevation, parse_timestamp(ts)
+    except (ValueError, TypeError):
+        return None
+
+
 def _parse_trkpt_with_time(
     elem: Any, current_time: str | None, current_ele: str | None = None
 ) -> Tuple[float, float, float, datetime] | None:
@@ -60,29 +173,100 @@ def _parse_trkpt_with_time(
     return None
 
 
+def _parse_xml_data_lxml(
+    bio: BinaryIO,
+) -> Iterable[Tuple[float, float, float, datetime]]:
+    """Parse XML data with lxml, filtering point elements at C level.
+
+    Entities are not resolved and nothing is fetched, matching defusedxml.
+    Syntax errors are raised as ParseError like the standard library parser.
+    """
+    kinds: Dict[str, str] = {}
+    location_keys: Tuple[str, str, str, str] | None = None
+    try:
+        for _, elem in lxml_etree.iterparse(  # type: ignore[union-attr]
+            bio,
+            events=("end",),
+            tag=_LXML_POINT_TAGS,
+            resolve_entities=False,
+            no_network=True,
+        ):
+            if _ROUTE_TAG_KINDS[elem.tag.rpartition("}")[2]] == "location":
+                if location_keys is None:
+                    location_keys = _location_keys(elem)
+                point = _parse_location_with_keys(elem, location_keys)
+            else:
+                trkpt_data: Dict[str, str] = {}
+                for child in elem:
+                    tag = child.tag
+                    if not isinstance(tag, str):
+                        continue  # comments and processing instructions
+                    kind = kinds.get(tag)
+                    if kind is None:
+                        local = tag.rpartition("}")[2]
+                        kind = kinds[tag] = _ROUTE_TAG_KINDS.get(local, "")
+                    if kind in ("time", "ele") and child.text:
+                        trkpt_data[kind] = child.text
+                point = _parse_trkpt_with_time(
+                    elem, trkpt_data.get("time"), trkpt_data.get("ele")
+                )
+            if point:
+                yield point
+            elem.clear()
+            parent = elem.getparent()
+            if parent is not None:
+                while elem.getprevious() is not None:
+                    del parent[0]
+    except lxml_etree.XMLSyntaxError as exc:  # type: ignore[union-attr]
+        raise ParseError(str(exc)) from exc
+
+
 def _parse_xml_data(bio: BinaryIO) -> Iterable[Tuple[float, float, float, datetime]]:
     """Parse XML data and yield GPS points."""
-    it = iterparse(bio, events=("end",))
+    if lxml_etree is not None:
+        yield from _parse_xml_data_lxml(bio)
+        return
     current_trkpt_data: Dict[str, str] = {}
-
-    for _, elem in it:
-        tag = elem.tag.split("}")[-1]
-        if tag in ("Location", "location"):
-            point = _parse_location_element(elem)
+    # Namespaced tag -> handling kind ("" if ignored), resolved once per tag
+    kinds: Dict[str, str] = {}
+    # Open ancestors, so finished elements can be detached and freed
+    parents: List[Any] = []
+    # Attribute names of Location elements, probed on the first one
+    location_keys: Tuple[str, str, str, str] | None = None
+
+    for event, elem in iterparse(bio, events=("start", "end")):
+        if event == "start":
+            parents.append(elem)
+            continue
+        parents.pop()
+        kind = kinds.get(elem.tag)
+        if kind is None:
+            local = elem.tag.rpartition("}")[2]
+            kind = kinds[elem.tag] = _ROUTE_TAG_KINDS.get(local, "")
+
+        if kind == "location":
+            if location_keys is None:
+                location_keys = _location_keys(elem)
+            point = _parse_location_with_keys(elem, location_keys)
             if point:
                 yield point
-        elif tag == "time" and elem.text:
-            current_trkpt_data["time"] = elem.text
-        elif tag in ("ele", "elevation") and elem.text:
-            current_trkpt_data["ele"] = elem.text
-        elif tag in ("trkpt", "trkPoint"):
+        elif kind == "trkpt":
             point = _parse_trkpt_with_time(
                 elem, current_trkpt_data.get("time"), current_trkpt_data.get("ele")
             )
             if point:
                 yield point
             current_trkpt_data.clear()
+        elif kind and elem.text:
+            # "time" and "ele" children are kept until their trkpt ends
+            current_trkpt_data[kind] = elem.text
         elem.clear()
+        if parents:
+            # Events arrive in batches, so later siblings may already be attached
+            # and the child removed may not be elem. Every child of a parent
+            # ends exactly once, so each parent gets one delete per child and
+            # is empty when it ends; queued elements keep their own data.
+            del parents[-1][-1]
 
 
 def _decode_line(line: bytes | bytearray | str) -> str | None:
@@ -94,14 +278,15 @@ def _decode_line(line: bytes | bytearray | str) -> str | None:
 
 
 def _extract_gps_from_line(
-    s: str,
+    line: bytes,
 ) -> Tuple[str | None, str | None, str | None, str | None]:
-    """Extract lat, lon, elevation, timestamp from line string."""
-    parts = s.replace('"', "").replace("'", "").split()
-    lat = next((p.split("=")[1] for p in parts if p.startswith("latitude")), None)
-    lon = next((p.split("=")[1] for p in parts if p.startswith("longitude")), None)
-    ele = next((p.split("=")[1] for p in parts if p.startswith("altitude")), None)
-    ts = next((p.split("=")[1] for p in parts if p.startswith("timestamp")), None)
+    """Extract lat, lon, elevation, timestamp from a raw line."""
+    fields: Dict[bytes, bytes] = {}
+    for key, double_q, single_q, bare in _LINE_FIELD_RE.findall(line):
+        fields.setdefault(key, double_q or single_q or bare)
+    lat, lon, ele, ts = (
+        _decode_line(fields[k]) if k in fields else None for k in _LINE_FIELD_KEYS
+    )
     return lat, lon, ele, ts
 
 
@@ -121,15 +306,36 @@ def _create_gps_point(
 def _parse_line_data(f: BinaryIO) -> Iterable[Tuple[float, float, float, datetime]]:
     """Parse line-based data and yield GPS points."""
     for line in f:
-        s = _decode_line(line)
-        if not s or "latitude" not in s or "longitude" not in s:
+        if b"latitude" not in line or b"longitude" not in line:
             continue
-        lat, lon, ele, ts = _extract_gps_from_line(s)
+        lat, lon, ele, ts = _extract_gps_from_line(line)
         point = _create_gps_point(lat, lon, ele, ts)
         if point:
             yield point
 
 
+class _PrefixedStream(io.RawIOBase):
+    """Raw stream replaying already-read bytes before the rest of a file."""
+
+    def __init__(self, head: bytes, rest: BinaryIO):
+        super().__init__()
+        self._head = memoryview(head)
+        self._rest = rest
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        if self._head:
+            n = min(len(buffer), len(self._head))
+            buffer[:n] = self._head[:n]
+            self._head = self._head[n:]
+            return n
+        data = self._rest.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
 def stream_points_from_route(
     f: BinaryIO,
 ) -> Iterable[Tuple[float, float, float, datetime]]:
@@ -138,17 +344,20 @@ def stream_points_from_route(
     Supports Apple Health `Route` XML with `Location` tags or GPX `trkpt` entries.
     Uses iterparse and clears elements to keep memory low.
     """
-    data = f.read()
-    try:
-        bio = __import__("io").BytesIO(data)
-        text_start = data[:4096].decode("utf-8", errors="ignore").lstrip()
-    except (UnicodeDecodeError, AttributeError):
-        return
-
-    if text_start.startswith("<?xml") or text_start.startswith("<"):
-        yield from _parse_xml_data(bio)
+    stream: BinaryIO
+    if isinstance(f, io.BytesIO):
+        # In-memory data is sniffed in place instead of replaying the head
+        pos = f.tell()
+        head = f.read(4096)
+        f.seek(pos)
+        stream = f
+    else:
+        head = f.read(4096)
+        stream = io.BufferedReader(_PrefixedStream(head, f))
+    if head.lstrip().startswith(b"<"):
+        yield from _parse_xml_data(stream)
     else:
-        yield from _parse_line_data(f)
+        yield from _parse_line_data(stream)
 
 
 class ExportReader:
@@ -157,11 +366,22 @@ class ExportReader:
     def __init__(self, zip_path: str):
         self.zip_path = zip_path
         self.zipfile = zipfile.ZipFile(zip_path, "r")
+        # Built once so path resolution is a dict lookup, not a namelist() scan
+        self._entries: Dict[str, zipfile.ZipInfo] = {
+            info.filename: info for info in self.zipfile.infolist()
+        }
+        # A route shared by overlapping workouts is resolved only once
+        self._resolved: Dict[str, str | None] = {}
+        # Recently decoded route files, filled by callers through route_memo
+        self.route_memo: OrderedDict[str, Any] = OrderedDict()
+        # scan_export results shared by collect_running_workouts/collect_routes
+        self._scans: Dict[str, Tuple[Any, Any]] = {}
 
     def __enter__(self):
         return self
 
     def __exit__(self, *args: object) -> None:
+        self.route_memo.clear()
         self.zipfile.close()
 
     def find_export_xml(self) -> str:
@@ -180,6 +400,13 @@ class ExportReader:
                 return n
         raise FileNotFoundError("Could not find export XML inside the zip")
 
+    def _open_export(self, xml_name: str) -> BinaryIO:
+        """Open the export XML behind a large buffer for the XML parser."""
+        return io.BufferedReader(
+            self.zipfile.open(xml_name),  # type: ignore[arg-type]
+            buffer_size=_EXPORT_BUFFER_SIZE,
+        )
+
     def _parse_workout_times(
         self, elem: Any
     ) -> Tuple[datetime | None, datetime | None]:
@@ -196,26 +423,6 @@ class ExportReader:
             edt = None
         return sdt, edt
 
-    def collect_running_workouts(
-        self, xml_name: str
-    ) -> Dict[str, Dict[str, datetime | None]]:
-        """Parse running workouts from export XML."""
-        workouts: Dict[str, Dict[str, datetime | None]] = {}
-        with self.zipfile.open(xml_name) as ef:
-            it = iterparse(ef, events=("end",))
-            idx = 0
-            for _, elem in it:
-                if (
-                    elem.tag.split("}")[-1] == "Workout"
-                    and elem.get("workoutActivityType")
-                    == "HKWorkoutActivityTypeRunning"
-                ):
-                    sdt, edt = self._parse_workout_times(elem)
-                    workouts[f"wk_{idx}"] = {"start": sdt, "end": edt}
-                    idx += 1
-                elem.clear()
-        return workouts
-
     def _parse_route_times(self, elem: Any) -> Tuple[datetime | None, datetime | None]:
         """Extract start and end times from route element."""
         rstart = elem.get("startDate") or elem.get("creationDate") or None
@@ -233,40 +440,81 @@ class ExportReader:
     def _extract_file_paths(self, elem: Any) -> List[str]:
         """Extract file paths from route element."""
         paths: List[str] = []
-        for fr in elem.iter():
-            if fr.tag.split("}")[-1] == "FileReference":
-                path = fr.get("path") or fr.text
-                if path:
-                    paths.append(path)
+        for fr in elem.iterfind(".//{*}FileReference"):
+            path = fr.get("path") or fr.text
+            if path:
+                paths.append(path)
         return paths
 
-    def collect_routes(
-        self, xml_name: str
-    ) -> List[Tuple[datetime | None, datetime | None, List[str]]]:
-        """Parse workout routes from export XML."""
+    def scan_export(self, xml_name: str) -> Tuple[
+        Dict[str, Dict[str, datetime | None]],
+        List[Tuple[datetime | None, datetime | None, List[str]]],
+    ]:
+        """Collect running workouts and workout routes in one pass over the XML.
+
+        Only top-level records are cleared and detached, so a WorkoutRoute
+        nested in its Workout still has its FileReference children when it ends.
+        """
+        workouts: Dict[str, Dict[str, datetime | None]] = {}
         routes: List[Tuple[datetime | None, datetime | None, List[str]]] = []
-        with self.zipfile.open(xml_name) as ef:
-            it = iterparse(ef, events=("end",))
-            for _, elem in it:
-                if elem.tag.split("}")[-1] == "WorkoutRoute":
+        local_names: Dict[str, str] = {}
+        root: Any = None
+        depth = 0
+        with self._open_export(xml_name) as ef:
+            for event, elem in iterparse(ef, events=("start", "end")):
+                if event == "start":
+                    if root is None:
+                        root = elem
+                    depth += 1
+                    continue
+                depth -= 1
+                tag = local_names.get(elem.tag)
+                if tag is None:
+                    tag = local_names[elem.tag] = elem.tag.rpartition("}")[2]
+
+                if tag == "Workout":
+                    if elem.get("workoutActivityType") == RUNNING_ACTIVITY_TYPE:
+                        sdt, edt = self._parse_workout_times(elem)
+                        workouts[f"wk_{len(workouts)}"] = {"start": sdt, "end": edt}
+                elif tag == "WorkoutRoute":
                     rstart_dt, rend_dt = self._parse_route_times(elem)
                     paths = self._extract_file_paths(elem)
                     if paths:
                         routes.append((rstart_dt, rend_dt, paths))
-                elem.clear()
-        return routes
+
+                if depth == 1:
+                    elem.clear()
+                    del root[-1]
+        return workouts, routes
+
+    def collect_running_workouts(
+        self, xml_name: str
+    ) -> Dict[str, Dict[str, datetime | None]]:
+        """Parse running workouts from export XML (one scan shared with routes)."""
+        return self._cached_scan(xml_name)[0]
+
+    def collect_routes(
+        self, xml_name: str
+    ) -> List[Tuple[datetime | None, datetime | None, List[str]]]:
+        """Parse workout routes from export XML (one scan shared with workouts)."""
+        return self._cached_scan(xml_name)[1]
+
+    def _cached_scan(self, xml_name: str) -> Tuple[Any, Any]:
+        """Return scan_export's result, parsing the XML only on first use."""
+        if xml_name not in self._scans:
+            self._scans[xml_name] = self.scan_export(xml_name)
+        return self._scans[xml_name]
 
     def _parse_route_from_text(
-        self, opening: str, body: str
+        self, opening: bytes, body: bytes
     ) -> Tuple[datetime | None, datetime | None, List[str]] | None:
         """Parse a single route from text match."""
+        attrs: Dict[bytes, str] = {}
+        for name, value in _ROUTE_ATTR_RE.findall(opening):
+            attrs.setdefault(name, value.decode("utf-8", errors="ignore"))
 
-        def find_attr(s: str, name: str) -> str | None:
-            p = re.search(rf'{name}="([^"]+)"', s)
-            return p.group(1) if p else None
-
-        rstart = find_attr(opening, "startDate") or find_attr(opening, "creationDate")
-        rend = find_attr(opening, "endDate")
+        rstart = attrs.get(b"startDate") or attrs.get(b"creationDate")
+        rend = attrs.get(b"endDate")
         try:
             rstart_dt = parse_timestamp(rstart) if rstart else None
         except (ValueError, TypeError):
@@ -275,7 +523,7 @@ class ExportReader:
             rend_dt = parse_timestamp(rend) if rend else None
         except (ValueError, TypeError):
             rend_dt = None
-        paths = re.findall(r'<FileReference[^>]*path="([^"]+)"', body)
+        paths = [p.decode("utf-8", errors="ignore") for p in _FILE_REF_RE.findall(body)]
         if paths:
             return (rstart_dt, rend_dt, paths)
         return None
@@ -283,25 +531,38 @@ class ExportReader:
     def collect_routes_fallback(
         self, xml_name: str
     ) -> List[Tuple[datetime | None, datetime | None, List[str]]]:
-        """Fallback text-based route parsing."""
+        """Fallback text-based route parsing.
+
+        Scans the raw bytes in chunks so the export is never held or decoded as
+        a whole; only the matched attribute values and paths are decoded. The
+        tail after the last complete route is carried into the next chunk.
+        """
         routes: List[Tuple[datetime | None, datetime | None, List[str]]] = []
-        try:
-            data = self.zipfile.read(xml_name).decode("utf-8", errors="ignore")
-            pattern = re.compile(
-                r"<WorkoutRoute([^>]*)>(.*?)</WorkoutRoute>", re.DOTALL
-            )
-            for m in pattern.finditer(data):
-                route = self._parse_route_from_text(m.group(1), m.group(2))
-                if route:
-                    routes.append(route)
-        except (UnicodeDecodeError, AttributeError):
-            pass
-        return routes
+        buf = b""
+        with self.zipfile.open(xml_name) as ef:
+            while True:
+                chunk = ef.read(_FALLBACK_CHUNK_SIZE)
+                buf += chunk
+                end = 0
+                for m in _WORKOUT_ROUTE_RE.finditer(buf):
+                    route = self._parse_route_from_text(m.group(1), m.group(2))
+                    if route:
+                        routes.append(route)
+                    end = m.end()
+                if not chunk:
+                    return routes
+                start = buf.find(_ROUTE_OPEN_TAG, end)
+                if start < 0:
+                    # Keep enough bytes to catch an opening tag split by the chunk
+                    start = max(end, len(buf) - len(_ROUTE_OPEN_TAG) + 1)
+                buf = buf[start:]
 
     def resolve_zip_path(self, ref_path: str) -> str | None:
         """Try several path variants to match FileReference inside ZIP."""
         if not ref_path:
             return None
+        if ref_path in self._resolved:
+            return self._resolved[ref_path]
         candidates: List[str] = [
             ref_path,
             ref_path.lstrip("/"),
@@ -315,10 +576,29 @@ class ExportReader:
                     "apple_health_export" + ref_path,
                 ]
             )
-        for c in candidates:
-            if c in self.zipfile.namelist():
-                return c
-        return None
+        resolved = next((c for c in candidates if c in self._entries), None)
+        self._resolved[ref_path] = resolved
+        return resolved
+
+    def archive_offset(self, ref_path: str) -> int:
+        """Return where a referenced file is stored in the archive (-1 if absent).
+
+        Reading route files in this order walks the zip front to back.
+        """
+        name = self.resolve_zip_path(ref_path)
+        return self._entries[name].header_offset if name else -1
+
+    def open_entry(self, name: str) -> BinaryIO:
+        """Open a resolved archive member for reading."""
+        return self.zipfile.open(self._entries[name])  # type: ignore
+
+    def entry_size(self, name: str) -> int:
+        """Return the decompressed size of a resolved archive member."""
+        return self._entries[name].file_size
+
+    def read_entry(self, name: str) -> bytes:
+        """Return the decompressed bytes of a resolved archive member."""
+        return self.zipfile.read(self._entries[name])
 
 
 def _time_ranges_overlap(
@@ -335,26 +615,38 @@ def _time_ranges_overlap(
     return latest_start <= earliest_end
 
 
-def _add_route_to_matching_workouts(
-    rstart: datetime | None,
-    rend: datetime | None,
-    paths: List[str],
-    workouts: Dict[str, Dict[str, datetime | None]],
-    workout_to_files: defaultdict[str, set[str]],
-) -> None:
-    """Add route paths to all workouts that overlap in time."""
-    for wid, w in workouts.items():
-        if _time_ranges_overlap(rstart, rend, w.get("start"), w.get("end")):
-            for p in paths:
-                workout_to_files[wid].add(p)
-
-
 def match_routes_to_workouts(
     routes: List[Tuple[datetime | None, datetime | None, List[str]]],
     workouts: Dict[str, Dict[str, datetime | None]],
-) -> defaultdict[str, set[str]]:
-    """Match route files to workouts by time overlap."""
-    workout_to_files: defaultdict[str, set[str]] = defaultdict(set)
+) -> Dict[str, List[str]]:
+    """Match route files to workouts by time overlap.
+
+    Workouts are sorted by start time with a running maximum of their end
+    times, so each route only visits workouts that can still overlap it.
+    Each workout's paths keep their export order, without duplicates.
+    """
+    workout_to_files: Dict[str, List[str]] = {}
+    timed = sorted(
+        (w["start"], w["end"], pos, wid)
+        for pos, (wid, w) in enumerate(workouts.items())
+        if w.get("start") is not None and w.get("end") is not None
+    )
+    starts = [start for start, _, _, _ in timed]
+    max_ends: List[Any] = []
+    for _, end, _, _ in timed:
+        max_ends.append(end if not max_ends or end > max_ends[-1] else max_ends[-1])
+
     for rstart, rend, paths in routes:
-        _add_route_to_matching_workouts(rstart, rend, paths, workouts, workout_to_files)
-    return workout_to_files
+        if rstart is None or rend is None:
+            continue
+        matched: List[Tuple[int, str]] = []
+        k = bisect_right(starts, rend) - 1
+        while k >= 0 and max_ends[k] >= rstart:
+            wstart, wend, pos, wid = timed[k]
+            if _time_ranges_overlap(rstart, rend, wstart, wend):
+                matched.append((pos, wid))
+            k -= 1
+        # Keep the workout order of the export for deterministic output
+        for _, wid in sorted(matched):
+            workout_to_files.setdefault(wid, []).extend(paths)
+    return {wid: list(dict.fromkeys(paths)) for wid, paths in workout_to_files.items()}
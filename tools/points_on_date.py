@@ -7,53 +7,48 @@ Prints CSV-like lines: timestamp, duration_since_prev_s, distance_m, speed_kmh
 """
 
 import argparse
-import math
 import xml.etree.ElementTree as ET
 import zipfile
 from datetime import datetime, timezone
-from io import BytesIO
-from typing import List, Tuple
+from math import asin, cos, radians, sin, sqrt
+from operator import itemgetter
+from typing import Dict, List, Tuple
+from xml.parsers import expat
 
+import numpy as np
 from dateutil import parser as dateparser
 
+EARTH_RADIUS_M = 6371000.0
+# Decompressed bytes searched per step when looking for the target date
+_SCAN_CHUNK_SIZE = 1 << 16
+# Bytes of a GPX file handed to expat per call; points are yielded in between
+_PARSE_CHUNK_SIZE = 1 << 16
+
 
 def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """Calculate distance between two GPS coordinates in meters using Haversine formula."""
-    earth_radius_m = 6371000.0
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = (
-        math.sin(dphi / 2) ** 2
-        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
-    )
-    return 2 * earth_radius_m * math.asin(math.sqrt(a))
-
-
-def _extract_coordinates(elem: ET.Element) -> Tuple[float, float] | None:
-    """Extract lat/lon coordinates from trkpt element."""
-    lat_str = elem.attrib.get("lat")
-    lon_str = elem.attrib.get("lon")
-    if lat_str is None or lon_str is None:
-        return None
-    return float(lat_str), float(lon_str)
-
-
-def _find_time_element(elem: ET.Element) -> ET.Element | None:
-    """Find time child element in trkpt."""
-    for child in elem:
-        if child.tag.endswith("time"):
-            return child
-    return None
-
-
-def _parse_timestamp(time_elem: ET.Element) -> datetime | None:
-    """Parse timestamp from time element."""
-    if time_elem.text is None:
-        return None
+    phi1 = radians(lat1)
+    phi2 = radians(lat2)
+    dphi = radians(lat2 - lat1)
+    dlambda = radians(lon2 - lon1)
+    a = sin(dphi / 2) ** 2 + cos(phi1) * cos(phi2) * sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * asin(sqrt(a))
+
+
+def _consecutive_haversine_m(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Haversine distances in meters between each point and the next."""
+    phi = np.radians(lats)
+    dphi = np.diff(phi)
+    dlambda = np.radians(np.diff(lons))
+    sin_dlambda = np.sin(dlambda / 2)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi[:-1]) * np.cos(phi[1:]) * sin_dlambda**2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def _parse_timestamp(text: str) -> datetime | None:
+    """Parse the text of a time element, assuming UTC when no offset is given."""
     try:
-        ts = dateparser.parse(time_elem.text)
+        ts = dateparser.parse(text)
         if ts.tzinfo is None:
             ts = ts.replace(tzinfo=timezone.utc)
         return ts
@@ -61,46 +56,124 @@ def _parse_timestamp(time_elem: ET.Element) -> datetime | None:
         return None
 
 
-def parse_gpx_points(gpx_bytes: bytes):
-    """Parse GPX and yield (timestamp(datetime), lat(float), lon(float)) for each trkpt."""
-    it = ET.iterparse(BytesIO(gpx_bytes))
-    for _, elem in it:
-        if elem.tag.endswith("trkpt"):
-            coords = _extract_coordinates(elem)
-            if coords is None:
-                elem.clear()
-                continue
-
-            time_elem = _find_time_element(elem)
-            if time_elem is None:
-                elem.clear()
-                continue
+class _TrkptCollector:
+    """Expat handlers that collect trkpt points without building elements.
+
+    Each trkpt takes the first time element directly inside it, like
+    ``trkpt.find("{*}time")``.
+    """
+
+    def __init__(self) -> None:
+        self.points: List[Tuple[datetime, float, float]] = []
+        self._depth = 0
+        self._trkpt_depth = 0  # 0 while outside any trkpt
+        self._lat: str | None = None
+        self._lon: str | None = None
+        self._time: str | None = None
+        self._time_parts: List[str] | None = None
+
+    def start(self, name: str, attrs: Dict[str, str]) -> None:
+        """Open an element; names are "namespace-uri local" or bare."""
+        self._depth += 1
+        local = name.rpartition(" ")[2]
+        if not self._trkpt_depth:
+            if local == "trkpt":
+                self._trkpt_depth = self._depth
+                self._lat, self._lon = attrs.get("lat"), attrs.get("lon")
+                self._time = None
+        elif (
+            local == "time"
+            and self._time is None
+            and self._depth == self._trkpt_depth + 1
+        ):
+            self._time_parts = []
+
+    def end(self, _name: str) -> None:
+        """Close an element, emitting the point when its trkpt ends."""
+        if self._time_parts is not None and self._depth == self._trkpt_depth + 1:
+            self._time = "".join(self._time_parts)
+            self._time_parts = None
+        elif self._depth == self._trkpt_depth:
+            self._trkpt_depth = 0
+            point = _trkpt_point(self._lat, self._lon, self._time)
+            if point is not None:
+                self.points.append(point)
+        self._depth -= 1
+
+    def data(self, text: str) -> None:
+        """Collect character data of the time element being read."""
+        if self._time_parts is not None:
+            self._time_parts.append(text)
+
+
+def _trkpt_point(
+    lat_str: str | None, lon_str: str | None, time_str: str | None
+) -> Tuple[datetime, float, float] | None:
+    """Build a point from trkpt attribute and time strings, or None if incomplete."""
+    if lat_str is None or lon_str is None or not time_str:
+        return None
+    ts = _parse_timestamp(time_str)
+    if ts is None:
+        return None
+    return ts, float(lat_str), float(lon_str)
 
-            ts = _parse_timestamp(time_elem)
-            if ts is None:
-                elem.clear()
-                continue
 
-            yield ts, coords[0], coords[1]
-        elem.clear()
+def parse_gpx_points(gpx_bytes: bytes):
+    """Parse GPX and yield (timestamp(datetime), lat(float), lon(float)) for each trkpt.
+
+    Uses expat callbacks, so no element objects are built. Malformed XML
+    raises ET.ParseError after the points read before the error.
+    """
+    collector = _TrkptCollector()
+    parser = expat.ParserCreate(namespace_separator=" ")
+    parser.buffer_text = True
+    parser.StartElementHandler = collector.start
+    parser.EndElementHandler = collector.end
+    parser.CharacterDataHandler = collector.data
+    view = memoryview(gpx_bytes)
+    try:
+        for pos in range(0, len(view), _PARSE_CHUNK_SIZE):
+            parser.Parse(view[pos:pos + _PARSE_CHUNK_SIZE], False)
+            yield from collector.points
+            collector.points.clear()
+        parser.Parse(b"", True)
+    except expat.ExpatError as exc:
+        raise ET.ParseError(str(exc)) from exc
+    yield from collector.points
+
+
+def _read_if_contains(
+    z: zipfile.ZipFile, info: zipfile.ZipInfo, needle: bytes
+) -> bytes | None:
+    """Return a zip member's bytes if they contain needle, else None.
+
+    The member is decompressed once, in chunks that are kept for a match; an
+    empty needle matches every member without searching.
+    """
+    overlap = len(needle) - 1
+    chunks: List[bytes] = []
+    found = not needle
+    with z.open(info) as f:
+        while chunk := f.read(_SCAN_CHUNK_SIZE):
+            if not found:
+                # Only the bytes around the chunk boundary are joined
+                tail = chunks[-1][-overlap:] if chunks and overlap else b""
+                found = needle in chunk or needle in tail + chunk[:overlap]
+            chunks.append(chunk)
+    return b"".join(chunks) if found else None
 
 
 def find_gpx_files_for_date(zip_path: str, target_date: str) -> List[Tuple[str, bytes]]:
     """Find GPX files in zip that contain the target date."""
     found: List[Tuple[str, bytes]] = []
+    needle = target_date.encode("utf-8")
     with zipfile.ZipFile(zip_path, "r") as z:
         for info in z.infolist():
-            name = info.filename
-            if not name.lower().endswith(".gpx"):
+            if not info.filename.lower().endswith(".gpx"):
                 continue
-            data = z.read(name)
-            # quick check: if the file contains the target date string, include it
-            if target_date.encode("utf-8") in data:
-                found.append((name, data))
-            else:
-                # still attempt parsing to be safe
-                if target_date in str(data):
-                    found.append((name, data))
+            data = _read_if_contains(z, info, needle)
+            if data is not None:
+                found.append((info.filename, data))
     return found
 
 
@@ -116,37 +189,35 @@ def extract_points_for_date(
             if ts.date().isoformat() == date_str:
                 all_points.append((ts, lat, lon, name))
     # sort by timestamp
-    all_points.sort(key=lambda x: x[0])
+    all_points.sort(key=itemgetter(0))
     return all_points
 
 
 def format_point_lines(
     points: List[Tuple[datetime, float, float, str]],
 ) -> List[Tuple[str, str, str, str, str]]:
-    """Format GPS points into CSV-ready lines with duration and speed calculations."""
-    lines: List[Tuple[str, str, str, str, str]] = []
-    prev_ts: datetime | None = None
-    prev_lat: float | None = None
-    prev_lon: float | None = None
-    for ts, lat, lon, fname in points:
-        if prev_ts is None or prev_lat is None or prev_lon is None:
-            dur = 0.0
-            dist = 0.0
-            speed = 0.0
-        else:
-            dur = (ts - prev_ts).total_seconds()
-            if dur <= 0:
-                dur = 0.0
-            dist = haversine_m(prev_lat, prev_lon, lat, lon)
-            speed = (dist / dur) * 3.6 if dur > 0 else 0.0
-        # timestamp in ISO
-        lines.append(
-            (ts.isoformat(), f"{dur:.2f}", f"{dist:.2f}", f"{speed:.2f}", fname)
+    """Format GPS points into CSV-ready lines with duration and speed calculations.
+
+    Durations, distances and speeds for all points are computed as arrays;
+    the first point and points with no elapsed time report zero.
+    """
+    if not points:
+        return []
+    lats = np.fromiter((p[1] for p in points), dtype=np.float64, count=len(points))
+    lons = np.fromiter((p[2] for p in points), dtype=np.float64, count=len(points))
+    durs = np.zeros(len(points))
+    durs[1:] = [(b[0] - a[0]).total_seconds() for a, b in zip(points, points[1:])]
+    np.maximum(durs, 0.0, out=durs)
+    dists = np.zeros(len(points))
+    dists[1:] = _consecutive_haversine_m(lats, lons)
+    speeds = np.zeros(len(points))
+    np.divide(dists * 3.6, durs, out=speeds, where=durs > 0)
+    return [
+        (ts.isoformat(), f"{dur:.2f}", f"{dist:.2f}", f"{speed:.2f}", fname)
+        for (ts, _, _, fname), dur, dist, speed in zip(
+            points, durs.tolist(), dists.tolist(), speeds.tolist()
         )
-        prev_ts = ts
-        prev_lat = lat
-        prev_lon = lon
-    return lines
+    ]
 
 
 def main():
@@ -0,0 +1,146 @@
+"""On-disk cache of parsed export data, reused across CLI runs.
+
+Each export.zip gets its own directory keyed by its path, size and
+modification time, so editing or replacing the archive starts a fresh cache.
+The directory holds the running workouts and routes found in export.xml
+(``index.json``) and one ``.npz`` file of point columns per route file.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import suppress
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from segment_analysis import PointArrays
+
+# Bump when the cached layout or parsing rules change
+CACHE_VERSION = 1
+
+
+def default_cache_root() -> str:
+    """Return the directory under which per-export caches are created."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "apple_health_segments")
+
+
+def _encode_dt(value: datetime | None) -> str | None:
+    return value.isoformat() if value is not None else None
+
+
+def _decode_dt(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+class RouteCache:
+    """Cache directory for one export archive."""
+
+    def __init__(self, zip_path: str, root: str | None = None):
+        stat = os.stat(zip_path)
+        key = ":".join(
+            str(part)
+            for part in (
+                CACHE_VERSION,
+                os.path.abspath(zip_path),
+                stat.st_size,
+                stat.st_mtime_ns,
+            )
+        )
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+        self.directory = os.path.join(root or default_cache_root(), digest)
+
+    def _write_atomic(self, name: str, write: Any) -> None:
+        """Write a cache file through a temporary file; failures are ignored.
+
+        The cache is best effort, so an unwritable cache directory only costs
+        a re-parse on the next run.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                write(fh)
+            os.replace(tmp_path, os.path.join(self.directory, name))
+        except Exception:  # pylint: disable=broad-except
+            pass  # a failed cache write must never abort processing
+        finally:
+            # Already gone after a successful replace
+            with suppress(OSError):
+                os.unlink(tmp_path)
+
+    def _route_file_name(self, ref: str) -> str:
+        return hashlib.sha1(ref.encode("utf-8")).hexdigest()[:16] + ".npz"
+
+    def load_index(
+        self,
+    ) -> Tuple[
+        Dict[str, Dict[str, datetime | None]],
+        List[Tuple[datetime | None, datetime | None, List[str]]],
+    ] | None:
+        """Return cached (running_workouts, routes), or None on a miss."""
+        try:
+            with open(
+                os.path.join(self.directory, "index.json"), encoding="utf-8"
+            ) as fh:
+                data = json.load(fh)
+            workouts = {
+                wid: {"start": _decode_dt(w["start"]), "end": _decode_dt(w["end"])}
+                for wid, w in data["workouts"].items()
+            }
+            routes = [
+                (_decode_dt(start), _decode_dt(end), list(paths))
+                for start, end, paths in data["routes"]
+            ]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return workouts, routes
+
+    def store_index(
+        self,
+        workouts: Dict[str, Dict[str, datetime | None]],
+        routes: List[Tuple[datetime | None, datetime | None, List[str]]],
+    ) -> None:
+        """Save running workouts and routes parsed from export.xml."""
+        data = {
+            "workouts": {
+                wid: {
+                    "start": _encode_dt(w.get("start")),
+                    "end": _encode_dt(w.get("end")),
+                }
+                for wid, w in workouts.items()
+            },
+            "routes": [
+                [_encode_dt(start), _encode_dt(end), paths]
+                for start, end, paths in routes
+            ],
+        }
+        self._write_atomic(
+            "index.json", lambda fh: fh.write(json.dumps(data).encode("utf-8"))
+        )
+
+    def load_points(self, ref: str) -> PointArrays | None:
+        """Return cached points of a route file, or None on a miss."""
+        path = os.path.join(self.directory, self._route_file_name(ref))
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return PointArrays(data["lat"], data["lon"], data["ele"], data["ts"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def store_points(self, ref: str, points: PointArrays) -> None:
+        """Save the points parsed from a route file."""
+        self._write_atomic(
+            self._route_file_name(ref),
+            lambda fh: np.savez_compressed(fh, **points._asdict()),
+        )
@@ -2,22 +2,91 @@
 from __future__ import annotations
 
 import math
-from datetime import datetime
-from typing import List, Tuple, Any, Dict
+from datetime import datetime, timezone, tzinfo
+from math import asin, cos, radians, sin, sqrt
+from typing import List, Tuple, Any, Dict, NamedTuple, Sequence
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+class PointArrays(NamedTuple):
+    """GPS samples of a route stored column-wise as float64 arrays.
+
+    Timestamps are POSIX seconds; naive datetimes are interpreted as UTC.
+    """
+
+    lat: np.ndarray
+    lon: np.ndarray
+    ele: np.ndarray
+    ts: np.ndarray
+
+
+def datetime_to_seconds(dt: datetime) -> float:
+    """Return POSIX seconds for a datetime, treating naive values as UTC."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def seconds_to_datetime(seconds: float, tz: tzinfo | None = None) -> datetime:
+    """Return an aware datetime for POSIX seconds, in tz (UTC by default)."""
+    return datetime.fromtimestamp(seconds, tz or timezone.utc)
+
+
+def points_to_arrays(
+    points: PointArrays | Sequence[Tuple[float, float, float, datetime]],
+) -> PointArrays:
+    """Convert (lat, lon, elevation, timestamp) tuples to PointArrays."""
+    if isinstance(points, PointArrays):
+        return points
+    n = len(points)
+    return PointArrays(
+        np.fromiter((p[0] for p in points), dtype=np.float64, count=n),
+        np.fromiter((p[1] for p in points), dtype=np.float64, count=n),
+        np.fromiter((p[2] for p in points), dtype=np.float64, count=n),
+        np.fromiter(
+            (datetime_to_seconds(p[3]) for p in points), dtype=np.float64, count=n
+        ),
+    )
+
+
+def sort_points_by_time(points: PointArrays) -> PointArrays:
+    """Return points reordered chronologically (stable for equal timestamps)."""
+    # Route files are normally already chronological; skip the column copies
+    if np.all(points.ts[1:] >= points.ts[:-1]):
+        return points
+    order = np.argsort(points.ts, kind="stable")
+    return PointArrays._make(column[order] for column in points)
 
 
 def haversine_meters(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """Return distance in meters between two lat/lon points."""
     earth_radius_m = 6371000.0
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = (
-        math.sin(dphi / 2) ** 2
-        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
-    )
-    return 2 * earth_radius_m * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    phi1 = radians(lat1)
+    phi2 = radians(lat2)
+    dphi = radians(lat2 - lat1)
+    dlambda = radians(lon2 - lon1)
+    a = sin(dphi / 2) ** 2 + cos(phi1) * cos(phi2) * sin(dlambda / 2) ** 2
+    return 2 * earth_radius_m * asin(sqrt(min(a, 1.0)))
+
+
+def _consecutive_distances(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Return haversine distances between consecutive points of a route.
+
+    Each latitude's cosine is shared by the two legs touching that point.
+    """
+    earth_radius_m = 6371000.0
+    phi = np.radians(lat)
+    cos_phi = np.cos(phi)
+    dphi = np.diff(phi)
+    dlambda = np.radians(np.diff(lon))
+    a = np.sin(dphi / 2) ** 2 + cos_phi[:-1] * cos_phi[1:] * np.sin(dlambda / 2) ** 2
+    return 2 * earth_radius_m * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
 
 
 def distance_3d_meters(lat1: float, lon1: float, ele1: float, lat2: float, lon2: float, ele2: float) -> float:
@@ -28,136 +97,189 @@ def distance_3d_meters(lat1: float, lon1: float, ele1: float, lat2: float, lon2:
 
 
 def _compute_intervals(
-    points: List[Tuple[float, float, float, datetime]],
+    points: PointArrays,
     max_speed_kmh: float,
     penalty_seconds: float,
-) -> Tuple[List[float], List[float], List[float], List[float]]:
-    """Compute cumulative distances and adjusted time deltas."""
-    n = len(points)
-    cum = [0.0] * n
-    time_deltas = [0.0] * n
-    dist_between = [0.0] * n
-    adj_time_deltas = [0.0] * n
-
-    for i in range(1, n):
-        lat1, lon1, ele1, _ = points[i - 1]
-        lat2, lon2, ele2, _ = points[i]
-        d = distance_3d_meters(lat1, lon1, ele1, lat2, lon2, ele2)
-        cum[i] = cum[i - 1] + d
-
-        t1 = points[i - 1][3]
-        t2 = points[i][3]
-        dt = max(0.0, (t2 - t1).total_seconds())
-        time_deltas[i] = dt
-        dist_between[i] = d
-
-        if dt <= 0 and d > 0:
-            inst_speed_kmh = float("inf")
-        else:
-            inst_speed_kmh = (d / dt) * 3.6 if dt > 0 else 0.0
+    collect_debug: bool = False,
+) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray] | None]:
+    """Compute cumulative distances and cumulative adjusted times.
 
-        if math.isinf(inst_speed_kmh):
-            adj = dt
-        else:
-            adj = dt + (penalty_seconds if inst_speed_kmh > max_speed_kmh else 0.0)
-        adj_time_deltas[i] = adj
-
-    return cum, time_deltas, dist_between, adj_time_deltas
+    Both arrays have one entry per point, starting at zero. With collect_debug,
+    also return the per-interval "adj_time", "time" and "dist" arrays, where
+    index i describes the interval (i - 1, i) and index 0 is zero.
+    """
+    n = len(points.ts)
+    if n < 2:
+        zeros = np.zeros(n)
+        intervals = {"adj_time": zeros, "time": zeros, "dist": zeros}
+        return zeros, zeros, intervals if collect_debug else None
+
+    horizontal = _consecutive_distances(points.lat, points.lon)
+    vertical = np.diff(points.ele)
+    d = np.hypot(horizontal, vertical, out=horizontal)
+    dt = np.diff(points.ts)
+    np.maximum(dt, 0.0, out=dt)
+
+    # Speed exceeds the limit when d * 3.6 > max_speed_kmh * dt, so no division
+    # is needed; zero-duration moves have infinite speed and stay unpenalized
+    penalized = d * 3.6 > max_speed_kmh * dt
+    penalized &= dt > 0
+    # Raw deltas are only reported in debug output; otherwise adjust in place
+    adj = dt.copy() if collect_debug else dt
+    np.add(adj, penalty_seconds, out=adj, where=penalized)
+
+    # Running sums go straight into the arrays that carry the leading zero
+    cum = np.zeros(n)
+    np.cumsum(d, out=cum[1:])
+    cum_adj_time = np.zeros(n)
+    np.cumsum(adj, out=cum_adj_time[1:])
+    if not collect_debug:
+        return cum, cum_adj_time, None
+    intervals = {
+        "adj_time": np.concatenate(([0.0], adj)),
+        "time": np.concatenate(([0.0], dt)),
+        "dist": np.concatenate(([0.0], d)),
+    }
+    return cum, cum_adj_time, intervals
 
 
 def _collect_debug_penalties(
     i: int,
     j: int,
-    adj_time_deltas: List[float],
-    time_deltas: List[float],
-    dist_between: List[float],
+    adj_time_deltas: np.ndarray,
+    time_deltas: np.ndarray,
+    dist_between: np.ndarray,
 ) -> List[Tuple[int, int, float, float, float]]:
     """Collect penalized intervals for debugging."""
     penalized_in_segment: List[Tuple[int, int, float, float, float]] = []
-    for k in range(i + 1, j + 1):
-        if adj_time_deltas[k] > time_deltas[k]:
-            inst_speed_kmh = (
-                (dist_between[k] / time_deltas[k]) * 3.6
-                if time_deltas[k] > 0
-                else float("inf")
-            )
-            penalized_in_segment.append(
-                (k - 1, k, time_deltas[k], inst_speed_kmh, dist_between[k])
-            )
+    window = slice(i + 1, j + 1)
+    mask = adj_time_deltas[window] > time_deltas[window]
+    for k in (np.flatnonzero(mask) + i + 1).tolist():
+        dt = float(time_deltas[k])
+        dist = float(dist_between[k])
+        inst_speed_kmh = (dist / dt) * 3.6 if dt > 0 else float("inf")
+        penalized_in_segment.append((k - 1, k, dt, inst_speed_kmh, dist))
     return penalized_in_segment
 
 
-def _find_best_segment(
-    n: int,
-    distances: Dict[str, List[float]],
-    target_m: float,
-    points: List[Tuple[float, float, float, datetime]],
-    intervals: Dict[str, List[float]],
-    debug_info: dict[str, Any] | None,
-) -> Tuple[
-    Tuple[float, datetime | None, datetime | None],
-    int,
-    int,
-    List[Tuple[int, int, List[Tuple[int, int, float, float, float]]]],
-]:
-    """Find best segment using sliding window."""
-    best = (float("inf"), None, None)
+def _sweep(
+    cum: Sequence[float], cum_adj_time: Sequence[float], target_m: float
+) -> Tuple[float, int, int]:
+    """Two-pointer scan for the fastest window covering target_m."""
+    n = len(cum)
+    best = math.inf
     best_i = best_j = -1
-    penalized_intervals: List[
-        Tuple[int, int, List[Tuple[int, int, float, float, float]]]
-    ] = []
 
     j = 0
     for i in range(n):
-        j = max(j, i + 1)
-        while j < n and (distances["cum"][j] - distances["cum"][i]) < target_m:
+        if j <= i:
+            j = i + 1
+        while j < n and (cum[j] - cum[i]) < target_m:
             j += 1
         if j >= n:
             break
 
-        duration = distances["cum_adj_time"][j] - distances["cum_adj_time"][i]
-        if debug_info is not None:
-            penalties = _collect_debug_penalties(
-                i, j, intervals["adj_time"], intervals["time"], intervals["dist"]
-            )
-            if penalties:
-                penalized_intervals.append((i, j, penalties))
-
-        if duration >= 0 and duration < best[0]:
-            best = (duration, points[i][3], points[j][3])
+        duration = cum_adj_time[j] - cum_adj_time[i]
+        if 0 <= duration < best:
+            best = duration
             best_i = i
             best_j = j
 
-    return best, best_i, best_j, penalized_intervals
+    return best, best_i, best_j
+
+
+# Compiled lazily by numba on first call when it is installed
+_sweep_native = njit(cache=True)(_sweep) if njit is not None else None
+
+
+def _sweep_vectorized(
+    cum: np.ndarray, cum_adj_time: np.ndarray, target_m: float
+) -> Tuple[float, int, int]:
+    """Array version of _sweep: locate every window end with searchsorted.
+
+    Window ends are corrected so each j is the first index after i where
+    cum[j] - cum[i] >= target_m, exactly as the two-pointer scan computes it.
+    """
+    n = len(cum)
+    i = np.arange(n)
+    j = np.maximum(np.searchsorted(cum, cum + target_m, side="left"), i + 1)
+    while True:
+        prev = np.maximum(j - 1, 0)
+        down = (j - 1 > i) & (j - 1 < n) & (cum[prev] - cum >= target_m)
+        if not down.any():
+            break
+        j[down] -= 1
+    while True:
+        capped = np.minimum(j, n - 1)
+        up = (j < n) & (cum[capped] - cum < target_m)
+        if not up.any():
+            break
+        j[up] += 1
+
+    valid = j < n
+    if not valid.any():
+        return math.inf, -1, -1
+    starts = i[valid]
+    ends = j[valid]
+    durations = cum_adj_time[ends] - cum_adj_time[starts]
+    durations[durations < 0] = np.inf
+    k = int(np.argmin(durations))
+    if not np.isfinite(durations[k]):
+        return math.inf, -1, -1
+    return float(durations[k]), int(starts[k]), int(ends[k])
+
+
+def _find_best_segment(
+    cum: np.ndarray,
+    cum_adj_time: np.ndarray,
+    target_m: float,
+) -> Tuple[float, int, int]:
+    """Find best segment using sliding window.
+
+    Returns (adjusted_duration, start_index, end_index).
+    """
+    if _sweep_native is not None:
+        best, best_i, best_j = _sweep_native(cum, cum_adj_time, float(target_m))
+        return float(best), int(best_i), int(best_j)
+    return _sweep_vectorized(cum, cum_adj_time, target_m)
 
 
 def _update_debug_info(
     debug_info: dict[str, Any],
     best_i: int,
     best_j: int,
-    cum: List[float],
+    cum: np.ndarray,
     n: int,
-    penalized_intervals: List[Tuple[int, int, List[Tuple[int, int, float, float, float]]]],
+    intervals: Dict[str, np.ndarray],
 ) -> None:
     """Update debug info with segment details."""
     if best_i < 0 or best_j < 0:
         return
+    # Only the winning window is reported, so scan its intervals once
+    penalized_intervals: List[
+        Tuple[int, int, List[Tuple[int, int, float, float, float]]]
+    ] = []
+    penalties = _collect_debug_penalties(
+        best_i, best_j, intervals["adj_time"], intervals["time"], intervals["dist"]
+    )
+    if penalties:
+        penalized_intervals.append((best_i, best_j, penalties))
     debug_info.update(
         {
             "best_i": best_i,
             "best_j": best_j,
-            "start_cum_dist": cum[best_i],
-            "end_cum_dist": cum[best_j],
-            "segment_dist": cum[best_j] - cum[best_i],
+            "start_cum_dist": float(cum[best_i]),
+            "end_cum_dist": float(cum[best_j]),
+            "segment_dist": float(cum[best_j] - cum[best_i]),
             "num_points": n,
-            "total_dist": cum[-1] if n > 0 else 0,
+            "total_dist": float(cum[-1]) if n > 0 else 0,
             "penalized_intervals": penalized_intervals,
         }
     )
 
 
 def best_segment_for_dist(
-    points: List[Tuple[float, float, float, datetime]],
+    points: PointArrays | Sequence[Tuple[float, float, float, datetime]],
     target_m: float,
     max_speed_kmh: float = 35.39,
     penalty_seconds: float = 3.0,
@@ -165,67 +287,94 @@ def best_segment_for_dist(
 ) -> Tuple[float, datetime | None, datetime | None, float, float]:
     """Return (duration, start_time, end_time, elevation_change, avg_speed_kmh).
 
-    For the given target distance in meters.
+    For the given target distance in meters. Points must be in chronological
+    order; start and end times are returned as UTC datetimes.
     """
-    if not points:
-        return (float("inf"), None, None, 0.0, 0.0)
+    debug_infos = [debug_info] if debug_info is not None else None
+    return best_segments_for_dists(
+        points, [target_m], max_speed_kmh, penalty_seconds, debug_infos
+    )[0]
 
-    n = len(points)
-    cum, time_deltas, dist_between, adj_time_deltas = _compute_intervals(
-        points, max_speed_kmh, penalty_seconds
-    )
 
-    cum_adj_time = [0.0] * n
-    for i in range(1, n):
-        cum_adj_time[i] = cum_adj_time[i - 1] + adj_time_deltas[i]
+def best_segments_for_dists(
+    points: PointArrays | Sequence[Tuple[float, float, float, datetime]],
+    targets_m: Sequence[float],
+    max_speed_kmh: float = 35.39,
+    penalty_seconds: float = 3.0,
+    debug_infos: Sequence[dict[str, Any]] | None = None,
+) -> List[Tuple[float, datetime | None, datetime | None, float, float]]:
+    """Return best_segment_for_dist results for several target distances.
 
-    distances = {"cum": cum, "cum_adj_time": cum_adj_time}
-    intervals = {"adj_time": adj_time_deltas, "time": time_deltas, "dist": dist_between}
+    Distances and adjusted times are computed once and shared by every
+    target; only the window scan runs per distance. debug_infos, when given,
+    holds one dict per target.
+    """
+    points = points_to_arrays(points)
+    n = len(points.ts)
+    if n == 0:
+        return [(float("inf"), None, None, 0.0, 0.0) for _ in targets_m]
 
-    best, best_i, best_j, penalized_intervals = _find_best_segment(
-        n, distances, target_m, points, intervals, debug_info
+    cum, cum_adj_time, intervals = _compute_intervals(
+        points, max_speed_kmh, penalty_seconds, collect_debug=debug_infos is not None
     )
+    results: List[Tuple[float, datetime | None, datetime | None, float, float]] = []
+    total_m = float(cum[-1])
+    for k, target_m in enumerate(targets_m):
+        if target_m > total_m:
+            # The whole route is shorter than the target; no window can cover it
+            best, best_i, best_j = math.inf, -1, -1
+        else:
+            best, best_i, best_j = _find_best_segment(cum, cum_adj_time, target_m)
 
-    # Calculate elevation change and speed for best segment
-    elevation_change = 0.0
-    avg_speed_kmh = 0.0
-    if best_i >= 0 and best_j >= 0:
-        start_ele = points[best_i][2]
-        end_ele = points[best_j][2]
-        elevation_change = end_ele - start_ele
-        
-        segment_distance = cum[best_j] - cum[best_i]
-        if best[0] > 0:
-            avg_speed_kmh = (segment_distance / best[0]) * 3.6
+        # Calculate elevation change and speed for best segment
+        start_time: datetime | None = None
+        end_time: datetime | None = None
+        elevation_change = 0.0
+        avg_speed_kmh = 0.0
+        if best_i >= 0 and best_j >= 0:
+            start_time = seconds_to_datetime(float(points.ts[best_i]))
+            end_time = seconds_to_datetime(float(points.ts[best_j]))
+            elevation_change = float(points.ele[best_j] - points.ele[best_i])
 
-    if debug_info is not None:
-        _update_debug_info(debug_info, best_i, best_j, cum, n, penalized_intervals)
+            segment_distance = float(cum[best_j] - cum[best_i])
+            if best > 0:
+                avg_speed_kmh = (segment_distance / best) * 3.6
 
-    return (best[0], best[1], best[2], elevation_change, avg_speed_kmh)
+        if debug_infos is not None and intervals is not None:
+            _update_debug_info(debug_infos[k], best_i, best_j, cum, n, intervals)
+
+        results.append((best, start_time, end_time, elevation_change, avg_speed_kmh))
+    return results
 
 
 def collect_penalty_messages(
     penalized_intervals_data: List[
         Tuple[int, int, List[Tuple[int, int, float, float, float]]]
     ],
-    points: List[Tuple[float, float, float, datetime]],
+    points: PointArrays | Sequence[Tuple[float, float, float, datetime]],
     penalty_messages: Dict[str, str],
+    tz: tzinfo | None = None,
 ) -> None:
-    """Collect penalty messages from penalized intervals data."""
+    """Collect penalty messages from penalized intervals data.
+
+    Timestamps are shown in tz, normally the workout's own UTC offset.
+    """
+    timestamps = points_to_arrays(points).ts
+    n = len(timestamps)
     for _, _, penalized_list in penalized_intervals_data:
         for from_idx, to_idx, interval_dur, inst_speed_kmh, _ in penalized_list:
-            ts: datetime | None = None
-            try:
-                ts = points[from_idx][3]
-            except IndexError:
-                ts = None
-            ts_formatted = (
-                ts.strftime("%d/%m/%Y %H:%M:%S") if ts is not None else "unknown"
-            )
-            key = ts_formatted
-            msg = (
-                f"{ts_formatted} | interval {from_idx}->{to_idx} | "
+            if 0 <= from_idx < n:
+                ts = seconds_to_datetime(float(timestamps[from_idx]), tz)
+                key = (
+                    f"{ts.day:02d}/{ts.month:02d}/{ts.year:04d} "
+                    f"{ts.hour:02d}:{ts.minute:02d}:{ts.second:02d}"
+                )
+            else:
+                key = "unknown"
+            # Only the first interval per timestamp is reported
+            if key in penalty_messages:
+                continue
+            penalty_messages[key] = (
+                f"{key} | interval {from_idx}->{to_idx} | "
                 f"{interval_dur:.2f}s | {inst_speed_kmh:.1f} km/h"
             )
-            if key not in penalty_messages:
-                penalty_messages[key] = msg